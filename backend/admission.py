@@ -0,0 +1,168 @@
+"""
+Admission control for the report pipeline.
+
+Requests are admitted while both the number of running reports and the
+bytes they hold stay under their limits. Everything else waits in a
+bounded queue with one FIFO per client, served round-robin, so a single
+client cannot fill the pipeline. When a queue is full the request is
+rejected at once with a Retry-After estimate based on recent service times.
+
+Everything runs on the event loop, so no locks are needed.
+"""
+
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+import asyncio
+import math
+import time
+
+from metrics import (
+    REPORT_ADMISSION_ACTIVE,
+    REPORT_ADMISSION_QUEUED,
+    REPORT_ADMISSION_REJECTIONS,
+    REPORT_ADMISSION_WAIT,
+)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        max_bytes: int = 32 * 1024 * 1024,
+        max_queued: int = 16,
+        max_queued_per_client: int = 4,
+        queue_timeout: float = 30.0,
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_bytes = max_bytes
+        self.max_queued = max_queued
+        self.max_queued_per_client = max_queued_per_client
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.active_bytes = 0
+        self.queued = 0
+        self.rejected = 0
+        self._queues = OrderedDict()  # client -> deque of (future, nbytes)
+        self._service_ewma = 1.0
+
+    def _fits(self, nbytes: int) -> bool:
+        if self.active >= self.max_concurrent:
+            return False
+        # a single request over the byte budget still runs once nothing else is
+        return self.active == 0 or self.active_bytes + nbytes <= self.max_bytes
+
+    def _grant(self, nbytes: int) -> None:
+        self.active += 1
+        self.active_bytes += nbytes
+        REPORT_ADMISSION_ACTIVE.set(value=self.active)
+
+    def _update_queued(self, delta: int) -> None:
+        self.queued += delta
+        REPORT_ADMISSION_QUEUED.set(value=self.queued)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._service_ewma * (self.queued + 1) / self.max_concurrent))
+
+    def _reject(self, status_code: int, reason: str):
+        self.rejected += 1
+        REPORT_ADMISSION_REJECTIONS.inc(reason)
+        raise AdmissionRejected(status_code, reason, self.retry_after())
+
+    def _dispatch(self) -> None:
+        # round-robin: the client served last moves to the back
+        while self._queues:
+            for client, q in self._queues.items():
+                # a waiter that timed out or was cancelled leaves a done future
+                # behind until its task runs again; it must not take a slot
+                while q and q[0][0].done():
+                    q.popleft()
+                    self._update_queued(-1)
+                if not q:
+                    del self._queues[client]
+                    break
+                if self._fits(q[0][1]):
+                    fut, nbytes = q.popleft()
+                    self._update_queued(-1)
+                    fut.set_result(None)
+                    self._grant(nbytes)
+                    if q:
+                        self._queues.move_to_end(client)
+                    else:
+                        del self._queues[client]
+                    break
+            else:
+                return
+
+    def _abandon(self, client: str, waiter) -> None:
+        q = self._queues.get(client)
+        if q is not None and waiter in q:
+            q.remove(waiter)
+            self._update_queued(-1)
+            if not q:
+                del self._queues[client]
+
+    async def acquire(self, client: str, nbytes: int) -> None:
+        start = time.perf_counter()
+        if not self.queued and self._fits(nbytes):
+            self._grant(nbytes)
+            REPORT_ADMISSION_WAIT.observe(0.0)
+            return
+        if self.queued >= self.max_queued:
+            self._reject(503, "queue_full")
+        q = self._queues.get(client)
+        if q is not None and len(q) >= self.max_queued_per_client:
+            self._reject(429, "client_queue_full")
+
+        fut = asyncio.get_running_loop().create_future()
+        waiter = (fut, nbytes)
+        self._queues.setdefault(client, deque()).append(waiter)
+        self._update_queued(1)
+        try:
+            await asyncio.wait_for(fut, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(client, waiter)
+            self._reject(503, "queue_timeout")
+        except asyncio.CancelledError:
+            # client went away while waiting; hand back a slot granted meanwhile
+            if fut.done() and not fut.cancelled():
+                self.release(nbytes, None)
+            else:
+                self._abandon(client, waiter)
+            raise
+        finally:
+            REPORT_ADMISSION_WAIT.observe(time.perf_counter() - start)
+
+    def release(self, nbytes: int, service_seconds) -> None:
+        self.active -= 1
+        self.active_bytes -= nbytes
+        REPORT_ADMISSION_ACTIVE.set(value=self.active)
+        if service_seconds is not None:
+            self._service_ewma = 0.8 * self._service_ewma + 0.2 * service_seconds
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, client: str, nbytes: int):
+        await self.acquire(client, nbytes)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(nbytes, time.perf_counter() - start)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "active_bytes": self.active_bytes,
+            "queued": self.queued,
+            "clients_waiting": len(self._queues),
+            "rejected": self.rejected,
+            "retry_after": self.retry_after(),
+        }
@@ -0,0 +1,96 @@
+"""
+Minimal in-process ASGI client for the load harness: no sockets, no extra
+dependencies, just the app called directly with HTTP and lifespan messages.
+"""
+
+import asyncio
+import json
+import uuid
+
+
+class AsgiClient:
+    def __init__(self, app, client_host: str = "127.0.0.1"):
+        self.app = app
+        self.client_host = client_host
+        self._lifespan_task = None
+        self._lifespan_in = asyncio.Queue()
+        self._lifespan_out = asyncio.Queue()
+
+    async def startup(self):
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}
+        self._lifespan_task = asyncio.create_task(
+            self.app(scope, self._lifespan_in.get, self._lifespan_out.put)
+        )
+        await self._lifespan_in.put({"type": "lifespan.startup"})
+        message = await self._lifespan_out.get()
+        if message["type"] != "lifespan.startup.complete":
+            raise RuntimeError(f"app startup failed: {message}")
+
+    async def shutdown(self):
+        if self._lifespan_task is None:
+            return
+        await self._lifespan_in.put({"type": "lifespan.shutdown"})
+        await self._lifespan_out.get()
+        await self._lifespan_task
+        self._lifespan_task = None
+
+    async def request(self, method: str, path: str, body: bytes = b"", headers=None):
+        """Send one request; returns (status, headers, body)."""
+        path, _, query = path.partition("?")
+        raw_headers = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+        raw_headers.append((b"content-length", str(len(body)).encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": raw_headers,
+            "client": (self.client_host, 50000),
+            "server": ("bench", 80),
+        }
+        status = 0
+        response_headers = []
+        chunks = []
+        finished = asyncio.Event()
+        sent_body = False
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished.set()
+
+        await self.app(scope, receive, send)
+        finished.set()
+        return status, response_headers, b"".join(chunks)
+
+    async def post_json(self, path: str, payload):
+        body = json.dumps(payload).encode()
+        return await self.request("POST", path, body, {"content-type": "application/json"})
+
+    async def post_file(self, path: str, filename: str, data: bytes, content_type: str):
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+        headers = {"content-type": f"multipart/form-data; boundary={boundary}"}
+        return await self.request("POST", path, body, headers)
@@ -0,0 +1,113 @@
+"""
+Benchmark for the streaming DOCX extractor against the python-docx path.
+
+First checks that both extractors return identical text on a corpus of
+synthetic reports plus edge-case documents (hyperlinks, tabs and breaks,
+tables, text boxes, content controls, tracked changes), with and without
+table text. It then times both on reports of doubling size and prints the
+wall time and the tracemalloc peak for each.
+
+Run from the backend directory:
+    python benchmarks/bench_docx.py --max-pages 256
+"""
+
+import argparse
+import copy
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_pipeline import extract_docx_paragraphs_fast, extract_docx_paragraphs_full  # noqa: E402
+
+from benchmarks.synthetic import make_docx  # noqa: E402
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+EDGE_BODY = f"""
+<w:body xmlns:w="{W}" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+  <w:p><w:r><w:t xml:space="preserve">  LDL Cholesterol: </w:t></w:r><w:r><w:tab/><w:t>160 mg/dL</w:t></w:r></w:p>
+  <w:p><w:hyperlink r:id="rId9"><w:r><w:t>lab portal</w:t></w:r></w:hyperlink><w:r><w:t> link</w:t></w:r></w:p>
+  <w:p><w:r><w:t>line one</w:t><w:br/><w:t>line two</w:t><w:br w:type="page"/><w:cr/><w:noBreakHyphen/><w:ptab/></w:r></w:p>
+  <w:p><w:ins w:id="1" w:author="x"><w:r><w:t>tracked insert</w:t></w:r></w:ins><w:r><w:t>kept</w:t></w:r></w:p>
+  <w:p><w:smartTag><w:r><w:t>smart</w:t></w:r></w:smartTag></w:p>
+  <w:sdt><w:sdtContent><w:p><w:r><w:t>inside content control</w:t></w:r></w:p></w:sdtContent></w:sdt>
+  <w:p><w:pPr><w:tabs><w:tab w:val="left" w:pos="720"/></w:tabs></w:pPr><w:r><w:t>HDL: 35 mg/dL</w:t></w:r></w:p>
+  <w:p/>
+  <w:p><w:r><w:t>   </w:t></w:r></w:p>
+  <w:tbl><w:tr>
+    <w:tc><w:p><w:r><w:t>Triglycerides</w:t></w:r></w:p></w:tc>
+    <w:tc><w:p><w:r><w:t>180 mg/dL</w:t></w:r></w:p>
+      <w:tbl><w:tr><w:tc><w:p><w:r><w:t>nested cell</w:t></w:r></w:p></w:tc></w:tr></w:tbl></w:tc>
+  </w:tr></w:tbl>
+  <w:p><w:r><w:t>Glucose – 110 mg/dL µ</w:t></w:r><w:r><w:pict><w:txbxContent>
+    <w:p><w:r><w:t>text box</w:t></w:r></w:p></w:txbxContent></w:pict></w:r></w:p>
+  <w:sectPr/>
+</w:body>
+"""
+
+
+def make_edge_docx() -> bytes:
+    from docx import Document
+    from lxml import etree
+
+    doc = Document()
+    body = doc.element.body
+    for child in list(body):
+        body.remove(child)
+    for child in etree.fromstring(EDGE_BODY):
+        body.append(copy.deepcopy(child))
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+def check_identical() -> int:
+    corpus = {"edge_cases": make_edge_docx()}
+    corpus.update({f"synthetic_{pages}p_seed{seed}": make_docx(pages, seed) for pages in (1, 5) for seed in (0, 1)})
+    mismatches = 0
+    for name, data in corpus.items():
+        for tables in (False, True):
+            fast = extract_docx_paragraphs_fast(data, tables)
+            full = extract_docx_paragraphs_full(data, tables)
+            if fast != full:
+                mismatches += 1
+                print(f"MISMATCH {name} tables={tables}\n  fast={fast!r}\n  full={full!r}")
+    print(f"identity check: {len(corpus) * 2 - mismatches}/{len(corpus) * 2} identical")
+    return mismatches
+
+
+def measure(fn, data: bytes):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(data)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-pages", type=int, default=128)
+    args = parser.parse_args()
+
+    failed = check_identical()
+    print(f"{'pages':>6} {'size':>9}  {'full s':>8} {'full peak':>10}  {'fast s':>8} {'fast peak':>10}")
+    pages = 8
+    while pages <= args.max_pages:
+        data = make_docx(pages)
+        full_s, full_peak = measure(extract_docx_paragraphs_full, data)
+        fast_s, fast_peak = measure(extract_docx_paragraphs_fast, data)
+        print(
+            f"{pages:>6} {len(data) / 1024:>8.0f}K  {full_s:>8.3f} {full_peak / 1e6:>9.1f}M  "
+            f"{fast_s:>8.3f} {fast_peak / 1e6:>9.1f}M"
+        )
+        pages *= 2
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
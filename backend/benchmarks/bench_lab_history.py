@@ -0,0 +1,83 @@
+"""
+Benchmark for the lab value history store.
+
+Appends reports (a handful of analytes each) for many users to a fresh log,
+then reports the append rate, the in-memory bytes per stored value against
+a list of dicts holding the same rows, the time to reload the log, and the
+latency of all-time and ranged trend queries.
+
+Run from the backend directory:
+    python benchmarks/bench_lab_history.py --users 1000 --reports 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lab_history import LabHistoryStore  # noqa: E402
+
+ANALYTES = ["ldl", "hdl", "glucose", "hba1c", "triglycerides", "total_cholesterol"]
+
+
+def make_report(rng: random.Random) -> list:
+    values = [{"analyte": a, "value": round(rng.uniform(40, 200), 1)} for a in rng.sample(ANALYTES, 4)]
+    values.append({"analyte": "blood_pressure", "value": rng.randint(100, 170), "diastolic": rng.randint(60, 100)})
+    return values
+
+
+def query_us(store: LabHistoryStore, users: int, **kwargs) -> float:
+    runs = 2000
+    start = time.perf_counter()
+    for i in range(runs):
+        store.trend(f"user-{i % users}", **kwargs)
+    return (time.perf_counter() - start) / runs * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--reports", type=int, default=200, help="reports per user")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lab_history.log")
+        store = LabHistoryStore(path)
+        start = time.perf_counter()
+        t0 = 1.7e9
+        for n in range(args.reports):
+            for u in range(args.users):
+                store.append(f"user-{u}", f"{n:016x}".ljust(64, "0"), t0 + n * 86400 + u, make_report(rng))
+        elapsed = time.perf_counter() - start
+        stats = store.stats()
+        reports = args.users * args.reports
+        print(f"appended {reports} reports ({stats['rows']} values) in {elapsed:.1f}s: {reports / elapsed:.0f} reports/s")
+        print(f"log file: {os.path.getsize(path) / stats['rows']:.1f} bytes/value")
+        print(f"columns:  {stats['bytes'] / stats['rows']:.1f} bytes/value")
+
+        sample = [dict(r, user_id="user-0", timestamp=t0) for _ in range(1000) for r in make_report(rng)]
+        tracemalloc.start()
+        rows = [dict(r) for r in sample]
+        as_dicts, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del rows
+        print(f"dicts:    {as_dicts / len(sample):.1f} bytes/value (list of dicts, for comparison)")
+
+        start = time.perf_counter()
+        LabHistoryStore(path)
+        print(f"reload from log: {time.perf_counter() - start:.2f}s")
+
+        middle = t0 + args.reports // 2 * 86400
+        print(f"trend, all analytes, all time:  {query_us(store, args.users):.1f} us")
+        print(f"trend, all analytes, 30 days:   {query_us(store, args.users, since=middle, until=middle + 30 * 86400):.1f} us")
+        print(f"trend, one analyte, last 10:    {query_us(store, args.users, analyte='ldl'):.1f} us")
+
+
+if __name__ == "__main__":
+    main()
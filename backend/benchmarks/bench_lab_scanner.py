@@ -0,0 +1,83 @@
+"""
+Benchmark for the single-pass lab value scanner.
+
+Scans multi-megabyte synthetic and adversarial texts at doubling sizes and
+prints seconds per MB; a linear scanner keeps that roughly flat. The legacy
+five-regex analyzer is timed on the small sizes only, because its lazy
+`.*?` patterns go quadratic on long lines full of markers.
+
+Run from the backend directory:
+    python benchmarks/bench_lab_scanner.py --max-mb 8
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_pipeline import scan_lab_values  # noqa: E402
+
+
+def legacy_scan(text: str) -> None:
+    lower = text.lower()
+    re.search(r"(\d{2,3})\s*/\s*(\d{2,3})\s*mmhg", lower)
+    re.search(r"cholesterol.*?(\d+)\s*mg/dl", lower)
+    re.search(r"ldl.*?(\d+)\s*mg/dl", lower)
+    re.search(r"hdl.*?(\d+)\s*mg/dl", lower)
+    re.search(r"triglycerides.*?(\d+)\s*mg/dl", lower)
+
+
+SHAPES = {
+    "report": (
+        "Patient lipid panel and metabolic screening results.\n"
+        "Total Cholesterol: 240 mg/dL\nLDL Cholesterol: 160 mg/dL\nHDL: 35 mg/dL\n"
+        "Triglycerides 180 mg/dL\nFasting glucose 110 mg/dL\nHbA1c 6.1 %\nBP 150/95 mmHg\n"
+    ),
+    # one endless line of markers with values that never carry a unit
+    "markers_one_line": "cholesterol ldl hdl triglycerides 12 ",
+    "digit_runs": "1" * 64 + " " * 64,
+    "bp_like": "12 / 34 ",
+}
+
+
+def make_text(unit: str, size: int) -> str:
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def timed(fn, text: str) -> float:
+    start = time.perf_counter()
+    fn(text)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-mb", type=int, default=8)
+    parser.add_argument("--legacy-max-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    sizes_mb = []
+    mb = 1
+    while mb <= args.max_mb:
+        sizes_mb.append(mb)
+        mb *= 2
+
+    for name, unit in SHAPES.items():
+        print(f"== {name}")
+        for mb in sizes_mb:
+            text = make_text(unit, mb * 1024 * 1024)
+            elapsed = timed(scan_lab_values, text)
+            print(f"  scanner  {mb:>4} MB  {elapsed:8.3f}s  {elapsed / mb:7.3f}s/MB")
+        kb = 16
+        while kb <= args.legacy_max_kb:
+            text = make_text(unit, kb * 1024)
+            elapsed = timed(legacy_scan, text)
+            print(f"  legacy   {kb:>4} KB  {elapsed:8.3f}s")
+            kb *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark for the mood detection engines: keywords vs the n-gram classifier.
+
+Reports accuracy on a small hand-labelled set (negations and paraphrases
+included), messages per second one at a time and in batches, and the p99
+per-message latency of the classifier against MOOD_CLASSIFIER_BUDGET_MS.
+
+Run from the backend directory:
+    python benchmarks/bench_mood_engines.py --batch 64
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import MOOD_CLASSIFIER_BUDGET_MS, get_mood_classifier, match_mood_keywords, match_mood_ngrams  # noqa: E402
+
+LABELLED = [
+    ("I feel so stressed about work and I can't sleep.", "stressed"),
+    ("There is so much pressure on me this week", "stressed"),
+    ("These deadlines are killing me", "stressed"),
+    ("Work has been really stressful lately", "stressed"),
+    ("I'm anxious about my exam tomorrow", "anxious"),
+    ("I keep worrying about everything", "anxious"),
+    ("I had a panic attack this morning", "anxious"),
+    ("I'm so nervous about the interview", "anxious"),
+    ("I feel sad today", "sad"),
+    ("I'm not happy at all", "sad"),
+    ("Honestly I'm just not feeling good", "sad"),
+    ("I've been crying all evening", "sad"),
+    ("I feel so down and hopeless", "sad"),
+    ("I'm so angry at my brother", "angry"),
+    ("My boss makes me furious", "angry"),
+    ("I'm really frustrated and annoyed", "angry"),
+    ("I feel so lonely these days", "lonely"),
+    ("No one ever talks to me", "lonely"),
+    ("I don't have any friends here", "lonely"),
+    ("I feel isolated since moving", "lonely"),
+    ("I'm exhausted after this week", "tired"),
+    ("So tired, I just want to sleep", "tired"),
+    ("I feel completely drained and burned out", "tired"),
+    ("I have no energy left", "tired"),
+    ("Everything is too much right now", "overwhelmed"),
+    ("I'm overwhelmed with all these tasks", "overwhelmed"),
+    ("I can't cope with everything at once", "overwhelmed"),
+    ("I have no motivation to study", "unmotivated"),
+    ("I don't have any motivation lately", "unmotivated"),
+    ("I feel lazy and unmotivated", "unmotivated"),
+    ("I keep procrastinating on everything", "unmotivated"),
+    ("I'm so happy today!", "happy"),
+    ("Feeling great after my run", "happy"),
+    ("I'm excited about the trip", "happy"),
+    ("I'm not stressed anymore, feeling great", "happy"),
+    ("I'm grateful for my friends", "happy"),
+    ("Thanks, what else can I do?", "neutral"),
+    ("Can you suggest something to read?", "neutral"),
+    ("I went to the store", "neutral"),
+    ("I'm not angry, just curious", "neutral"),
+    ("What time is it?", "neutral"),
+    ("Tell me a fun fact", "neutral"),
+]
+
+LONG_MESSAGE = (
+    "Today started fine but then everything piled up at once and I kept thinking about "
+    "the deadline, my family and whether I am doing enough. "
+) * 80
+
+
+def accuracy(engine) -> float:
+    return sum(engine(text)[0] == label for text, label in LABELLED) / len(LABELLED)
+
+
+def per_second(fn, items, min_time: float = 0.5) -> float:
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        fn(items)
+        count += len(items)
+    return count / (time.perf_counter() - start)
+
+
+def p99_ms(fn, message: str, runs: int = 500) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(message)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[int(len(times) * 0.99) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch", type=int, default=64)
+    args = parser.parse_args()
+
+    messages = [text for text, _ in LABELLED]
+    batch = (messages * (args.batch // len(messages) + 1))[: args.batch]
+    engines = {"keywords": match_mood_keywords, "ngram": match_mood_ngrams}
+    mood_classifier = get_mood_classifier()
+
+    print(f"classifier backend: {mood_classifier.backend}, budget {MOOD_CLASSIFIER_BUDGET_MS} ms/message")
+    print(f"{'engine':<9} {'accuracy':>8} {'msg/s':>10} {'p99 short ms':>13} {'p99 long ms':>12}")
+    for name, engine in engines.items():
+        rate = per_second(lambda items: [engine(m) for m in items], messages)
+        print(
+            f"{name:<9} {accuracy(engine):>8.1%} {rate:>10.0f} "
+            f"{p99_ms(engine, messages[0]):>13.3f} {p99_ms(engine, LONG_MESSAGE):>12.3f}"
+        )
+    rate = per_second(mood_classifier.classify_batch, batch)
+    print(f"ngram classify_batch({args.batch}): {rate:.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Micro-benchmark for the keyword mood matcher against the legacy detector.
+
+The legacy detector lowercases the whole message and runs one `any()` scan
+per mood in priority order. Both are timed side by side on a short chat
+message and on long pastes with no keyword, ordinary prose, and a keyword
+near the start or the end; the moods they return must agree.
+
+Run from the backend directory:
+    python benchmarks/bench_mood_keywords.py
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import match_mood_keywords  # noqa: E402
+
+
+def legacy_detect(message: str) -> str:
+    text = (message or "").lower()
+    if any(w in text for w in ["stress", "stressed", "pressure", "overload"]):
+        return "stressed"
+    if any(w in text for w in ["anxious", "anxiety", "panic"]):
+        return "anxious"
+    if any(w in text for w in ["sad", "upset", "depressed", "down"]):
+        return "sad"
+    if any(w in text for w in ["angry", "mad", "furious"]):
+        return "angry"
+    if any(w in text for w in ["lonely", "alone", "no one"]):
+        return "lonely"
+    if any(w in text for w in ["tired", "exhausted", "burned out", "burnt out"]):
+        return "tired"
+    if any(w in text for w in ["overwhelmed", "too much"]):
+        return "overwhelmed"
+    if any(w in text for w in ["no motivation", "unmotivated", "lazy"]):
+        return "unmotivated"
+    if any(w in text for w in ["happy", "good", "excited"]):
+        return "happy"
+    return "neutral"
+
+
+WORDS = (
+    "the of and to in is was it for on that with as at by this had from but not what all were when "
+    "we there can your which their said if will each about how up out them then many some so these "
+    "would other into has more two like see time could make than first been its who now people my "
+    "made over did down only way find use may water long little very after called just where most "
+    "know get through back much before go good new write our used me too any day same right look "
+    "think also around another came come work three word must because does part"
+).split()
+NEUTRAL_WORDS = [w for w in WORDS if legacy_detect(w) == "neutral"]
+
+
+def filler(words, size: int, seed: int) -> str:
+    rnd = random.Random(seed)
+    out, length = [], 0
+    while length < size:
+        word = rnd.choice(words)
+        out.append(word)
+        length += len(word) + 1
+    return " ".join(out)
+
+
+def cases(scale: int) -> dict:
+    return {
+        "48-char message": "I feel so stressed about work and I can't sleep.",
+        f"{11 * scale}KB, no keyword": filler(NEUTRAL_WORDS, 11000 * scale, 1),
+        f"{19 * scale}KB prose": filler(WORDS, 19000 * scale, 2),
+        f"{33 * scale}KB, early keyword": "I am stressed. " + filler(NEUTRAL_WORDS, 33000 * scale, 3),
+        f"{33 * scale}KB, late keyword": filler(NEUTRAL_WORDS, 33000 * scale, 4) + " so stressed",
+    }
+
+
+def micros(fn, message: str, repeat: int = 7) -> float:
+    number = 2000 if len(message) < 1000 else 50
+    return min(timeit.repeat(lambda: fn(message), number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=1, help="multiply the long message sizes")
+    args = parser.parse_args()
+
+    print(f"{'message':<24} {'mood':<9} {'legacy us':>10} {'matcher us':>11}")
+    for name, message in cases(args.scale).items():
+        mood = legacy_detect(message)
+        assert match_mood_keywords(message)[0] == mood, name
+        print(
+            f"{name:<24} {mood:<9} {micros(legacy_detect, message):>10.1f} "
+            f"{micros(match_mood_keywords, message):>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark for the report cache across worker processes.
+
+Runs 1..N worker processes. Each one serves the same skewed stream of report
+requests (a few popular reports, a long tail): a cache hit returns the stored
+result, and a miss runs the real analysis on a synthetic report and stores it.
+Each worker count runs twice, once with per-process caches only and once
+backed by a SharedCache file. The benchmark prints the hit rate and
+throughput for each run. With per-process caches the hit rate drops as
+workers are added, because each worker has to warm its own copy.
+
+Run from the backend directory:
+    python benchmarks/bench_shared_cache.py --max-workers 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_pipeline import build_report_result  # noqa: E402
+from report_cache import ReportCache  # noqa: E402
+from shared_cache import SharedCache  # noqa: E402
+
+from benchmarks.synthetic import make_report_text  # noqa: E402
+
+
+def request_stream(seed: int, count: int, reports: int):
+    rng = random.Random(seed)
+    # Pareto-ish popularity: low ids are requested far more often
+    return [min(int(rng.paretovariate(1.2)) - 1, reports - 1) for _ in range(count)]
+
+
+def worker(args):
+    index, requests, reports, pages, shared_path = args
+    shared = SharedCache(shared_path) if shared_path else None
+    cache = ReportCache(max_entries=reports, shared=shared)
+    text = make_report_text(pages)
+    for report_id in request_stream(index, requests, reports):
+        key = f"report-{report_id}"
+        if cache.get(key) is None:
+            cache.put(key, build_report_result(text))
+    stats = cache.stats()
+    cache.close()
+    return stats["hits"] + stats["shared_hits"], stats["misses"]
+
+
+def run(workers: int, requests: int, reports: int, pages: int, shared: bool) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        shared_path = os.path.join(tmp, "cache.sqlite3") if shared else None
+        if shared_path:
+            SharedCache(shared_path).close()  # create the schema once up front
+        jobs = [(i, requests, reports, pages, shared_path) for i in range(workers)]
+        start = time.perf_counter()
+        with multiprocessing.Pool(workers) as pool:
+            counts = pool.map(worker, jobs)
+        wall = time.perf_counter() - start
+    hits = sum(h for h, _ in counts)
+    total = hits + sum(m for _, m in counts)
+    return {"hit_rate": hits / total, "throughput_rps": total / wall}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--requests", type=int, default=300, help="requests per worker")
+    parser.add_argument("--reports", type=int, default=200, help="distinct reports")
+    parser.add_argument("--pages", type=int, default=5, help="pages per synthetic report")
+    args = parser.parse_args()
+
+    print(f"cpus={os.cpu_count()} requests/worker={args.requests} reports={args.reports}")
+    print(f"{'workers':>7}  {'cache':<6}  {'hit rate':>8}  {'req/s':>9}")
+    for workers in range(1, args.max_workers + 1):
+        for shared in (False, True):
+            result = run(workers, args.requests, args.reports, args.pages, shared)
+            print(
+                f"{workers:>7}  {'shared' if shared else 'local':<6}  "
+                f"{result['hit_rate']:>8.1%}  {result['throughput_rps']:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+In-process ASGI load harness: drives each route at a fixed concurrency and
+records throughput, latency percentiles and peak memory.
+"""
+
+import asyncio
+import resource
+import time
+import tracemalloc
+
+import main
+from report_cache import ReportCache
+
+from .asgi import AsgiClient
+from .synthetic import make_docx, make_pdf
+
+PDF_TYPE = "application/pdf"
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def build_scenarios(report_pages=(1, 5, 20)) -> dict:
+    """name -> coroutine factory taking the client and returning (status, headers, body)."""
+    scenarios = {
+        "chatbox": lambda c: c.post_json("/chatbox", {"message": "I feel stressed and tired today"}),
+        "chat_mood": lambda c: c.post_json("/chat/mood", {"mood": "Anxious", "message": "big exam tomorrow"}),
+        "fitness_plan": lambda c: c.post_json(
+            "/fitness/plan", {"goal": "Weight Loss", "activity_level": "Beginner", "age_group": "46+"}
+        ),
+    }
+    for pages in report_pages:
+        pdf = make_pdf(pages, seed=pages)
+        docx = make_docx(pages, seed=pages)
+        scenarios[f"report_pdf_{pages}p"] = (
+            lambda c, data=pdf, n=pages: c.post_file("/health/report", f"report-{n}.pdf", data, PDF_TYPE)
+        )
+        scenarios[f"report_docx_{pages}p"] = (
+            lambda c, data=docx, n=pages: c.post_file("/health/report", f"report-{n}.docx", data, DOCX_TYPE)
+        )
+    return scenarios
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+async def _drive(app, make_request, requests: int, concurrency: int):
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker(n: int):
+        nonlocal remaining, errors
+        # one simulated client address per worker, so report admission sees separate clients
+        client = AsgiClient(app, client_host=f"10.0.{n // 256}.{n % 256}")
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            status, _, _ = await make_request(client)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def _run(scenarios, requests: int, concurrency: int, warmup: int) -> dict:
+    client = AsgiClient(main.app)
+    await client.startup()
+    results = {}
+    try:
+        for name, make_request in scenarios.items():
+            await _drive(main.app, make_request, warmup, min(concurrency, max(warmup, 1)))
+            tracemalloc.start()
+            latencies, errors, wall = await _drive(main.app, make_request, requests, concurrency)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            latencies.sort()
+            results[name] = {
+                "requests": requests,
+                "concurrency": concurrency,
+                "errors": errors,
+                "throughput_rps": round(requests / wall, 2),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+                "peak_traced_kb": round(peak / 1024, 1),
+            }
+    finally:
+        await client.shutdown()
+    results["_process"] = {"max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    return results
+
+
+def run_load(
+    requests: int = 200,
+    concurrency: int = 16,
+    warmup: int = 10,
+    report_pages=(1, 5, 20),
+    only=None,
+    report_cache: bool = False,
+) -> dict:
+    """
+    Run every scenario (or the ones named in `only`). The report cache is
+    disabled unless asked for, so repeated uploads measure the real pipeline.
+    Peak traced memory covers this process only, not report worker processes.
+    """
+    if not report_cache:
+        main.report_cache = ReportCache(max_entries=0)
+    scenarios = build_scenarios(report_pages)
+    if only:
+        scenarios = {k: v for k, v in scenarios.items() if any(o in k for o in only)}
+    return asyncio.run(_run(scenarios, requests, concurrency, warmup))
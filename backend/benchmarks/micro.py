@@ -0,0 +1,77 @@
+"""
+Micro-benchmarks for the pure helpers in main.py and report_pipeline.py.
+"""
+
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from main import (
+    FITNESS_TIPS,
+    REPORT_GENERAL_GUIDANCE,
+    detect_mood_from_message,
+    fitness_plan_response,
+    normalize_mood_label,
+    report_response_body,
+    select_fitness_plan,
+)
+from report_pipeline import analyze_report_text, build_report_result
+
+from .synthetic import make_report_text
+
+SHORT_MESSAGE = "I feel so stressed about work and I can't sleep."
+LONG_MESSAGE = (
+    "Today started fine but then everything piled up at once and I kept thinking about "
+    "the deadline, my family and whether I am doing enough. "
+) * 80
+
+
+def _default_encode(content) -> bytes:
+    # what a route returning a plain dict costs: jsonable_encoder, then JSONResponse
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def _cases():
+    report_1p = make_report_text(1)
+    report_20p = make_report_text(20)
+    report_result = build_report_result(report_1p)
+    plan_args = ("Weight Loss", "Beginner", "46+")
+    return {
+        "detect_mood_short": lambda: detect_mood_from_message(SHORT_MESSAGE),
+        "detect_mood_long": lambda: detect_mood_from_message(LONG_MESSAGE),
+        "normalize_mood_exact": lambda: normalize_mood_label("Tired / Burned out"),
+        "normalize_mood_fallback": lambda: normalize_mood_label("feeling pretty low energy today"),
+        "select_fitness_plan": lambda: select_fitness_plan("Weight Loss", "Beginner", "46+"),
+        "analyze_report_1_page": lambda: analyze_report_text(report_1p),
+        "analyze_report_20_pages": lambda: analyze_report_text(report_20p),
+        # response serialization: the default dict path vs pre-encoded fragments
+        "encode_report_default": lambda: _default_encode({
+            "file_name": "report.pdf",
+            "summary": report_result["summary"],
+            "general_advice": REPORT_GENERAL_GUIDANCE,
+        }),
+        "encode_report_spliced": lambda: report_response_body("report.pdf", report_result),
+        "encode_fitness_plan_default": lambda: _default_encode({
+            "goal": plan_args[0],
+            "activity_level": plan_args[1],
+            "age_group": plan_args[2],
+            "plan": select_fitness_plan(*plan_args),
+            "tips": FITNESS_TIPS,
+        }),
+        "encode_fitness_plan_spliced": lambda: fitness_plan_response(*plan_args).body,
+    }
+
+
+def run_micro(min_time: float = 0.2, repeat: int = 5) -> dict:
+    """Best-of-`repeat` time per call for each case, in microseconds."""
+    results = {}
+    for name, fn in _cases().items():
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        # scale so each repeat runs for at least min_time seconds
+        per_call = min(timer.repeat(repeat=1, number=number)) / number
+        number = max(number, int(min_time / per_call) if per_call else number)
+        best = min(timer.repeat(repeat=repeat, number=number)) / number
+        results[name] = {"us_per_call": round(best * 1e6, 3), "ops_per_sec": round(1 / best, 1)}
+    return results
@@ -0,0 +1,110 @@
+"""
+Backend benchmark suite: micro-benchmarks plus an in-process ASGI load run.
+
+Run from the backend directory:
+    python -m benchmarks.run                              # print results
+    python -m benchmarks.run --save bench_baseline.json
+    python -m benchmarks.run --compare bench_baseline.json
+
+--compare exits non-zero when a latency or throughput figure regresses by
+more than --threshold percent against the saved baseline.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from .load import run_load
+from .micro import run_micro
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+# metric -> True when larger is better
+TRACKED = {
+    "us_per_call": False,
+    "throughput_rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    regressions = []
+    for section in ("micro", "load"):
+        for name, metrics in current.get(section, {}).items():
+            old = baseline.get(section, {}).get(name)
+            if not old:
+                continue
+            for metric, higher_is_better in TRACKED.items():
+                if metric not in metrics or not old.get(metric):
+                    continue
+                change = (metrics[metric] - old[metric]) / old[metric] * 100
+                worse = -change if higher_is_better else change
+                flag = "REGRESSION" if worse > threshold else ""
+                print(f"{section}.{name}.{metric}: {old[metric]} -> {metrics[metric]} ({change:+.1f}%) {flag}")
+                if flag:
+                    regressions.append(f"{section}.{name}.{metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AI Well-Being backend.")
+    parser.add_argument("--requests", type=int, default=200, help="requests per load scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20], help="synthetic report sizes")
+    parser.add_argument("--only", nargs="+", help="run only scenarios whose name contains one of these")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--report-cache", action="store_true", help="leave the report result cache on")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=20.0, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+    }
+    if not args.skip_micro:
+        results["micro"] = run_micro()
+    if not args.skip_load:
+        results["load"] = run_load(
+            requests=args.requests,
+            concurrency=args.concurrency,
+            report_pages=tuple(args.pages),
+            only=args.only,
+            report_cache=args.report_cache,
+        )
+
+    print(json.dumps(results, indent=2))
+
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold}%", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
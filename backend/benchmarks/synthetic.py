@@ -0,0 +1,106 @@
+"""
+Synthetic lab reports for the benchmarks: plain text, PDF and DOCX of a
+given page count. The PDF writer is hand-rolled so no extra dependency is
+needed; DOCX files are built with python-docx, which the backend already uses.
+"""
+
+import io
+import random
+
+NARRATIVE = [
+    "Patient was seen for a routine annual check-up and reports feeling generally well.",
+    "No acute distress noted. Vitals were recorded at rest after five minutes seated.",
+    "Diet and exercise habits were discussed; patient walks three times per week.",
+    "Follow-up recommended in six months or sooner if symptoms change.",
+    "Sample collected after an overnight fast of approximately twelve hours.",
+]
+
+LAB_LINES = [
+    "Blood Pressure: {sys}/{dia} mmHg",
+    "Total Cholesterol: {chol} mg/dL",
+    "LDL Cholesterol: {ldl} mg/dL",
+    "HDL Cholesterol: {hdl} mg/dL",
+    "Triglycerides: {tri} mg/dL",
+    "Fasting Glucose: {glu} mg/dL",
+    "HbA1c: {a1c} %",
+    "TSH: {tsh} mIU/L",
+]
+
+LINES_PER_PAGE = 45
+
+
+def make_report_lines(pages: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    lines = []
+    for page in range(pages):
+        page_lines = [f"Laboratory Report - page {page + 1}"]
+        while len(page_lines) < LINES_PER_PAGE:
+            if rng.random() < 0.3:
+                page_lines.append(rng.choice(LAB_LINES).format(
+                    sys=rng.randint(105, 165), dia=rng.randint(65, 100),
+                    chol=rng.randint(150, 260), ldl=rng.randint(70, 180),
+                    hdl=rng.randint(30, 75), tri=rng.randint(80, 250),
+                    glu=rng.randint(75, 140), a1c=round(rng.uniform(4.8, 7.2), 1),
+                    tsh=round(rng.uniform(0.3, 6.0), 2),
+                ))
+            else:
+                page_lines.append(rng.choice(NARRATIVE))
+        lines.append(page_lines)
+    return lines
+
+
+def make_report_text(pages: int, seed: int = 0) -> str:
+    return "\n".join("\n".join(page) for page in make_report_lines(pages, seed))
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: int, seed: int = 0) -> bytes:
+    page_lines = make_report_lines(pages, seed)
+    # objects: 1 catalog, 2 pages, 3 font, then (page, content) per page
+    objects = {}
+    kids = []
+    for i, lines in enumerate(page_lines):
+        page_id = 4 + 2 * i
+        content_id = page_id + 1
+        kids.append(f"{page_id} 0 R")
+        text_ops = "".join(f"({_pdf_escape(ln)}) '\n" for ln in lines)
+        stream = f"BT\n/F1 10 Tf\n14 TL\n50 800 Td\n{text_ops}ET\n".encode("latin-1", "replace")
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"endstream"
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+    objects[3] = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = out.tell()
+        out.write(b"%d 0 obj\n" % obj_id + objects[obj_id] + b"\nendobj\n")
+    xref_at = out.tell()
+    count = max(objects) + 1
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+    for obj_id in range(1, count):
+        out.write(b"%010d 00000 n \n" % offsets[obj_id])
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref_at))
+    return out.getvalue()
+
+
+def make_docx(pages: int, seed: int = 0) -> bytes:
+    from docx import Document
+
+    doc = Document()
+    for i, lines in enumerate(make_report_lines(pages, seed)):
+        for ln in lines:
+            doc.add_paragraph(ln)
+        if i < pages - 1:
+            doc.add_page_break()
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
@@ -0,0 +1,196 @@
+"""
+Offline bulk analysis of archived reports.
+
+Runs the same extraction and analysis as POST /health/report over a
+directory tree (or a manifest listing one path per line), across all cores,
+and appends one JSON line per file to the output:
+
+    {"path": ..., "ok": true, "summary": ..., "findings": [...], "seconds": ...}
+    {"path": ..., "ok": false, "error": "..."}
+
+The output file doubles as the checkpoint: running the same command again
+skips every path already recorded in it, so an interrupted run picks up where
+it stopped. Pass --retry-failed to redo the files that failed; their old
+failure lines are removed from the output first.
+
+Run from the backend directory:
+    python bulk_analyze.py /archive/reports --out results.jsonl
+    python bulk_analyze.py manifest.txt --out results.jsonl --workers 8
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator, List, Set
+import argparse
+import json
+import os
+import sys
+import time
+
+from report_pipeline import ANALYZER_VERSION, process_report
+
+REPORT_EXTENSIONS = (".pdf", ".docx")
+
+
+def find_reports(target: str, extensions=REPORT_EXTENSIONS) -> Iterator[str]:
+    """Report paths under a directory, or the paths listed in a manifest file."""
+    if os.path.isdir(target):
+        for root, dirs, files in os.walk(target):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(extensions):
+                    yield os.path.join(root, name)
+        return
+    base = os.path.dirname(os.path.abspath(target))
+    with open(target, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line if os.path.isabs(line) else os.path.join(base, line)
+
+
+def load_checkpoint(out_path: str, retry_failed: bool) -> Set[str]:
+    """
+    Paths already recorded in the output; a torn last line from a crash is cut
+    off. With retry_failed, failure records are dropped from the output so the
+    retried files end up with one line each.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, "rb+") as fh:
+        data = fh.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            fh.truncate(end)
+    kept = []
+    for line in data[:end].splitlines(keepends=True):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("ok") or not retry_failed:
+            done.add(record["path"])
+            kept.append(line)
+    if retry_failed and len(kept) < len(data[:end].splitlines()):
+        # write the kept lines next to the output and swap it in, so a crash leaves one or the other
+        tmp_path = out_path + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.writelines(kept)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, out_path)
+    return done
+
+
+def analyze_file(path: str) -> dict:
+    """Runs in a worker process; never raises, so one bad file cannot stop the run."""
+    start = time.perf_counter()
+    try:
+        size = os.path.getsize(path)
+        # process_report maps a path, and an empty file cannot be mapped
+        result, stats = process_report(path, path if size else b"")
+    except Exception as e:
+        return {"path": path, "ok": False, "error": f"{type(e).__name__}: {e}", "bytes": 0}
+    return {
+        "path": path,
+        "ok": True,
+        "summary": result["summary"],
+        "findings": result["findings"],
+        "pdf_page_failures": stats.get("pdf_page_failures", 0),
+        "seconds": round(time.perf_counter() - start, 4),
+        "bytes": size,
+        "analyzer_version": ANALYZER_VERSION,
+    }
+
+
+class Progress:
+    def __init__(self, total: int, every: float):
+        self.total = total
+        self.every = every
+        self.done = 0
+        self.failed = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self._last = self.started
+
+    def add(self, record: dict) -> None:
+        self.done += 1
+        self.bytes += record.get("bytes", 0)
+        if not record["ok"]:
+            self.failed += 1
+            print(f"failed: {record['path']}: {record['error']}", file=sys.stderr)
+        now = time.perf_counter()
+        if now - self._last >= self.every:
+            self._last = now
+            print(self.line(), file=sys.stderr)
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "files": self.done,
+            "failed": self.failed,
+            "seconds": round(elapsed, 2),
+            "files_per_sec": round(self.done / elapsed, 2) if elapsed else 0.0,
+            "mb_per_sec": round(self.bytes / elapsed / 1e6, 2) if elapsed else 0.0,
+        }
+
+    def line(self) -> str:
+        s = self.summary()
+        return (
+            f"{self.done}/{self.total} files, {s['failed']} failed, "
+            f"{s['files_per_sec']} files/s, {s['mb_per_sec']} MB/s"
+        )
+
+
+def run(paths: List[str], out_path: str, workers: int, progress: Progress) -> None:
+    # keep a bounded number of files in flight so results stream out in step
+    max_in_flight = workers * 4
+    pending = iter(paths)
+    with open(out_path, "a", encoding="utf-8") as out, ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        try:
+            while True:
+                for path in pending:
+                    in_flight.add(pool.submit(analyze_file, path))
+                    if len(in_flight) >= max_in_flight:
+                        break
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record = future.result()
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    progress.add(record)
+                # one flush per batch of results keeps the checkpoint current
+                out.flush()
+        except KeyboardInterrupt:
+            for future in in_flight:
+                future.cancel()
+            raise
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("target", help="directory to walk, or a manifest file with one path per line")
+    parser.add_argument("--out", required=True, help="JSONL output; also the resume checkpoint")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--retry-failed", action="store_true", help="redo files recorded as failed")
+    parser.add_argument("--progress-every", type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    done = load_checkpoint(args.out, args.retry_failed)
+    paths = [p for p in find_reports(args.target) if p not in done]
+    if done:
+        print(f"resuming: {len(done)} files already in {args.out}", file=sys.stderr)
+    progress = Progress(len(paths), args.progress_every)
+    try:
+        run(paths, args.out, max(1, args.workers), progress)
+    except KeyboardInterrupt:
+        print(f"interrupted; run the same command again to resume. {progress.line()}", file=sys.stderr)
+        return 130
+    print(json.dumps(progress.summary()), file=sys.stderr)
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Time budgets for report processing.
+
+A deadline is an absolute time.monotonic() value. CLOCK_MONOTONIC is shared
+by every process on the host, so the request handler can compute it once and
+send it along with the tasks it hands to the report worker processes.
+
+Page loops call check_deadline() between pages. That alone cannot stop a
+single page that keeps pypdf busy, so in a process's main thread (where the
+report pool runs its tasks) deadline_alarm() also arms SIGALRM, and the
+handler raises ReportDeadlineExceeded from whatever Python code is running.
+The timer repeats every ALARM_REPEAT_SECONDS until the block exits, in case
+a parser's own `except Exception` swallows the first one.
+"""
+
+from contextlib import contextmanager
+from typing import Optional
+import signal
+import threading
+import time
+
+ALARM_REPEAT_SECONDS = 0.05
+
+
+class ReportDeadlineExceeded(Exception):
+    pass
+
+
+def deadline_after(budget_seconds: float) -> Optional[float]:
+    """The deadline `budget_seconds` from now; None (no deadline) for a budget <= 0."""
+    return time.monotonic() + budget_seconds if budget_seconds > 0 else None
+
+
+def deadline_passed(deadline: Optional[float]) -> bool:
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def check_deadline(deadline: Optional[float]) -> None:
+    if deadline_passed(deadline):
+        raise ReportDeadlineExceeded()
+
+
+def _on_alarm(signum, frame):
+    raise ReportDeadlineExceeded()
+
+
+@contextmanager
+def deadline_alarm(deadline: Optional[float]):
+    """
+    Raise ReportDeadlineExceeded inside the block once `deadline` passes.
+    Outside the main thread, or without setitimer (Windows), the block only
+    stops where it calls check_deadline().
+    """
+    check_deadline(deadline)
+    if (
+        deadline is None
+        or not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, max(deadline - time.monotonic(), 0.001), ALARM_REPEAT_SECONDS)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
@@ -0,0 +1,56 @@
+"""
+JSON response encoding.
+
+Dynamic values are encoded with orjson when it is installed and with the
+stdlib otherwise. Constant parts of a response are serialized once into an
+object fragment ('"key":value,...' without the braces) and spliced into the
+encoded body, so they are not re-encoded on every request.
+
+Routes that return a Response built here also skip FastAPI's
+jsonable_encoder pass over the returned dict.
+"""
+
+from typing import Optional
+import json
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder produces the same JSON
+    orjson = None
+
+ENCODER = "orjson" if orjson is not None else "json"
+
+
+def dumps(value) -> bytes:
+    """Compact UTF-8 JSON, the same bytes FastAPI's JSONResponse would send."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def object_fragment(value: dict) -> bytes:
+    """Encode a dict once as object members, ready to pass to splice()."""
+    return dumps(value)[1:-1]
+
+
+def splice(value: dict, *fragments: bytes) -> bytes:
+    """Encode `value` and append the pre-encoded object members after its own."""
+    members = [dumps(value)[1:-1], *fragments]
+    return b"{" + b",".join(m for m in members if m) + b"}"
+
+
+class FastJSONResponse(Response):
+    """Drop-in for JSONResponse that uses dumps() and passes bytes through as-is."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        return dumps(content)
+
+
+def json_response(content, status_code: int = 200, headers: Optional[dict] = None) -> FastJSONResponse:
+    return FastJSONResponse(content=content, status_code=status_code, headers=headers)
@@ -0,0 +1,215 @@
+"""
+Append-only per-user history of lab values.
+
+Each stored value is one fixed-layout binary record in an append-only log
+file: timestamp, report key, value, diastolic value, then the user id and
+analyte name. The report key (the first 8 bytes of the report's sha256)
+keeps a report a user has already stored, re-uploaded or retried, from
+being stored again.
+In memory, every (user, analyte) pair is a column set: a sorted array('d')
+of timestamps plus array('f') values, and diastolic values for blood
+pressure only. A row therefore costs 12 bytes, or 16 with a diastolic value.
+Range queries bisect the timestamp column and slice, so they never touch
+rows outside the range. Running min/max are kept per series, so the
+all-time trend summary is O(1).
+
+All worker processes on a host can append to the same log. Each process
+folds in records written by the others (and its own) by reading the log
+from where it last stopped, before it answers a query.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Optional, Set
+import math
+import os
+import struct
+import threading
+
+# timestamp, report key, value, diastolic (nan if none), len(user), len(analyte)
+_RECORD = struct.Struct("<dQffBB")
+
+
+def report_key(sha256: str) -> int:
+    return int(sha256[:16], 16)
+
+
+class LabSeries:
+    __slots__ = ("times", "values", "diastolic", "min_value", "max_value")
+
+    def __init__(self, with_diastolic: bool):
+        self.times = array("d")
+        self.values = array("f")
+        self.diastolic = array("f") if with_diastolic else None
+        self.min_value = math.inf
+        self.max_value = -math.inf
+
+    def add(self, timestamp: float, value: float, diastolic: float) -> None:
+        if not self.times or timestamp >= self.times[-1]:
+            i = len(self.times)
+        else:
+            # an upload from a worker whose clock is slightly behind
+            i = bisect_right(self.times, timestamp)
+        self.times.insert(i, timestamp)
+        self.values.insert(i, value)
+        if self.diastolic is not None:
+            self.diastolic.insert(i, diastolic)
+        self.min_value = min(self.min_value, value)
+        self.max_value = max(self.max_value, value)
+
+    def point(self, i: int) -> list:
+        """[timestamp, value] or, for blood pressure, [timestamp, systolic, diastolic]."""
+        point = [self.times[i], _number(self.values[i])]
+        if self.diastolic is not None:
+            point.append(_number(self.diastolic[i]))
+        return point
+
+    def nbytes(self) -> int:
+        columns = (self.times, self.values, self.diastolic)
+        return sum(c.itemsize * len(c) for c in columns if c is not None)
+
+
+def _number(value: float):
+    value = round(value, 4)
+    return int(value) if value.is_integer() else value
+
+
+class LabHistoryStore:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._users: Dict[str, Dict[str, LabSeries]] = {}
+        self._reports: Dict[str, Set[int]] = {}  # user -> keys of the reports stored
+        self._rows = 0
+        self._offset = 0
+        # the (user, report, timestamp) of the last record read from the log, and
+        # whether its report was stored before; one append writes one such run
+        self._batch = None
+        self._duplicate = False
+        self._lock = threading.Lock()
+        if path:
+            with self._lock:
+                self._catch_up()
+
+    def _add(self, user_id: str, analyte: str, timestamp: float, value: float, diastolic: float) -> None:
+        series = self._users.setdefault(user_id, {}).get(analyte)
+        if series is None:
+            series = self._users[user_id][analyte] = LabSeries(not math.isnan(diastolic))
+        series.add(timestamp, value, diastolic)
+        self._rows += 1
+
+    def _catch_up(self) -> None:
+        """Fold in every complete record appended to the log since the last call."""
+        try:
+            with open(self.path, "rb") as fh:
+                fh.seek(self._offset)
+                data = fh.read()
+        except FileNotFoundError:
+            return
+        pos = 0
+        size = _RECORD.size
+        while pos + size <= len(data):
+            timestamp, report, value, diastolic, user_len, analyte_len = _RECORD.unpack_from(data, pos)
+            end = pos + size + user_len + analyte_len
+            if end > len(data):
+                break  # another process is half way through writing it
+            user_id = data[pos + size:pos + size + user_len].decode("utf-8")
+            analyte = data[pos + size + user_len:end].decode("ascii")
+            batch = (user_id, report, timestamp)
+            if batch != self._batch:
+                # two processes can both write the same report; every process
+                # reads the log in the same order and keeps the first copy
+                reports = self._reports.setdefault(user_id, set())
+                self._duplicate = report in reports
+                reports.add(report)
+                self._batch = batch
+            if not self._duplicate:
+                self._add(user_id, analyte, timestamp, value, diastolic)
+            pos = end
+        self._offset += pos
+
+    def append(self, user_id: str, sha256: str, timestamp: float, readings: Iterable[dict]) -> None:
+        """
+        Store each reading ({"analyte", "value"[, "diastolic"]}) of one report,
+        identified by its sha256 hex digest, unless the user already has it.
+        """
+        rows = [
+            (r["analyte"], float(r["value"]), float(r.get("diastolic", math.nan)))
+            for r in readings
+        ]
+        if not rows:
+            return
+        report = report_key(sha256)
+        with self._lock:
+            if not self.path:
+                reports = self._reports.setdefault(user_id, set())
+                if report not in reports:
+                    reports.add(report)
+                    for analyte, value, diastolic in rows:
+                        self._add(user_id, analyte, timestamp, value, diastolic)
+                return
+            self._catch_up()
+            if report in self._reports.get(user_id, ()):
+                return
+            user = user_id.encode("utf-8")
+            blob = b"".join(
+                _RECORD.pack(timestamp, report, value, diastolic, len(user), len(analyte))
+                + user + analyte.encode("ascii")
+                for analyte, value, diastolic in rows
+            )
+            # one O_APPEND write per report, so records from several workers do not interleave
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, blob)
+            finally:
+                os.close(fd)
+            self._catch_up()
+
+    def trend(
+        self,
+        user_id: str,
+        analyte: Optional[str] = None,
+        last: int = 10,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> Dict[str, dict]:
+        """
+        Per analyte: count, min, max (systolic for blood pressure) and latest
+        reading in [since, until] (all time by default), and the last `last`
+        points of that range.
+        """
+        with self._lock:
+            if self.path:
+                self._catch_up()
+            series_by_analyte = self._users.get(user_id, {})
+            names = [analyte] if analyte is not None else sorted(series_by_analyte)
+            out = {}
+            for name in names:
+                series = series_by_analyte.get(name)
+                if series is None:
+                    continue
+                lo = 0 if since is None else bisect_left(series.times, since)
+                hi = len(series.times) if until is None else bisect_right(series.times, until)
+                if lo >= hi:
+                    continue
+                if lo == 0 and hi == len(series.times):
+                    low, high = series.min_value, series.max_value
+                else:
+                    window = series.values[lo:hi]
+                    low, high = min(window), max(window)
+                out[name] = {
+                    "count": hi - lo,
+                    "min": _number(low),
+                    "max": _number(high),
+                    "latest": series.point(hi - 1),
+                    "series": [series.point(i) for i in range(max(lo, hi - max(last, 0)), hi)],
+                }
+            return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "rows": self._rows,
+                "bytes": sum(s.nbytes() for user in self._users.values() for s in user.values()),
+                "persistent": bool(self.path),
+            }
@@ -1,15 +1,89 @@
-from fastapi import FastAPI, UploadFile, File
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, List
+import startup  # first, so the startup clock covers the imports below
+
+with startup.import_timer("fastapi"):
+    from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response, Body
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import StreamingResponse
+    from fastapi.routing import APIRoute
+with startup.import_timer("pydantic"):
+    from pydantic import BaseModel, Field, ValidationError
+from typing import Any, Optional, List, Dict, Tuple, Union
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import logging
+import math
+import mmap
+import os
 import random
-import io
 import re
+import tempfile
+import time
+import uuid
+import zlib
+
+from admission import AdmissionController, AdmissionRejected
+from deadlines import deadline_after, deadline_passed
+from lab_history import LabHistoryStore
+from json_responses import FastJSONResponse, dumps, json_response, object_fragment, splice
+from metrics import (
+    MOOD_CLASSIFIER_OVER_BUDGET,
+    MetricsMiddleware,
+    REGISTRY,
+    REPORT_BUDGET_EXHAUSTED,
+    REPORT_JOBS_FINISHED,
+    REPORT_POOL_RESTARTS,
+    record_report_stats,
+    stage_timer,
+)
+from mood_classifier import MoodClassifier, build_lexicon
+from profiler import ProfilerMiddleware, ProfileStore, current_profile, profile_call, profile_sync_call
+from report_cache import ReportCache
+from report_jobs import DONE, FAILED, ReportJobStore
+from report_pipeline import (
+    ANALYZER_VERSION,
+    LAB_TARGETS,
+    REPORT_DOCX_TABLES,
+    REPORT_PDF_EARLY_EXIT,
+    REPORT_PDF_EARLY_EXIT_TARGETS,
+    REPORT_PDF_MAX_PAGES,
+    REPORT_PDF_PAGES_PER_TASK,
+    build_report_result,
+    extract_pdf_pages,
+    extract_text_by_name,
+    mark_report_partial,
+    process_report,
+)
+from shared_cache import SharedCache
+from sessions import MemorySessionBackend, SessionRecord, SqliteSessionBackend
+
+# python-docx (with lxml) and pypdf are only needed by /health/report, so they
+# are imported on first use (or by the background warm-up) instead of here.
+REPORT_PARSER_MODULES = ("docx", "pypdf")
+# Set to 0 to skip the background warm-up and load everything on first use.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") != "0"
+
+@asynccontextmanager
+async def lifespan(app):
+    # the hooks live further down, next to what they start
+    start_sessions()
+    start_lab_history()
+    start_report_pool()
+    await start_report_job_runners()
+    try:
+        yield
+    finally:
+        await stop_report_job_runners()
+        stop_report_pool()
+        stop_lab_history()
+        stop_sessions()
 
-from docx import Document
-from pypdf import PdfReader
 
-app = FastAPI()
+# Routes on hot paths return json_response()/pre-encoded bytes directly; the
+# rest still go through jsonable_encoder, then the same fast encoder.
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
+logger = logging.getLogger(__name__)
 
 # ---------- CORS ----------
 
@@ -26,6 +100,44 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(startup.FirstResponseMiddleware)
+
+# ---------- PROFILING ----------
+
+# Send the token in X-Profile-Token to profile one request; unset disables the header.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN") or None
+# Fraction of requests profiled without the header (0 = none).
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "request-profiles")
+
+# added last so it is the outermost layer and sees serialization and the other middleware
+app.add_middleware(
+    ProfilerMiddleware,
+    store=ProfileStore(
+        PROFILE_DIR,
+        max_files=int(os.getenv("PROFILE_MAX_FILES", "50")),
+        max_bytes=int(os.getenv("PROFILE_MAX_BYTES", str(20 * 1024 * 1024))),
+    ),
+    token=PROFILE_TOKEN,
+    sample_rate=PROFILE_SAMPLE_RATE,
+    interval=PROFILE_INTERVAL_MS / 1000,
+)
+
+
+class ProfiledRoute(APIRoute):
+    """Samples the threadpool thread that runs a sync endpoint of a profiled request."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = profile_sync_call(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+if PROFILE_TOKEN or PROFILE_SAMPLE_RATE > 0:
+    # every route below is declared after this, so they all use it
+    app.router.route_class = ProfiledRoute
 
 # ---------- MODELS ----------
 
@@ -40,6 +152,11 @@ class FitnessRequest(BaseModel):
 
 class ChatboxRequest(BaseModel):
     message: str
+    session_id: Optional[str] = Field(default=None, max_length=64)
+
+
+class MoodClassifyRequest(BaseModel):
+    messages: List[str]
 
 
 # ============================================================
@@ -254,77 +371,233 @@ FITNESS_TIPS = [
 
 # ======================= HELPERS ============================
 
+MOOD_LABEL_MAPPING = {
+    "happy": "happy",
+    "neutral": "neutral",
+    "stressed": "stressed",
+    "anxious": "anxious",
+    "sad": "sad",
+    "lonely": "lonely",
+    "angry": "angry",
+    "tired / burned out": "tired",
+    "tired/burned out": "tired",
+    "tired": "tired",
+    "overwhelmed": "overwhelmed",
+    "unmotivated / low energy": "unmotivated",
+    "unmotivated": "unmotivated",
+    "low energy": "unmotivated",
+}
+
+
+# Every label, looked for at each position with the alternatives in mapping
+# order: re takes the first alternative that matches, so each hit is the
+# earliest label in the mapping that starts there.
+_MOOD_LABEL_RE = re.compile("(?=(" + "|".join(re.escape(label) for label in MOOD_LABEL_MAPPING) + "))")
+_MOOD_LABEL_ORDER = {label: i for i, label in enumerate(MOOD_LABEL_MAPPING)}
+_MOOD_LABELS = list(MOOD_LABEL_MAPPING)
+
+
 def normalize_mood_label(mood: str) -> str:
     if not mood:
         return "neutral"
     m = mood.lower().strip()
-    mapping = {
-        "happy": "happy",
-        "neutral": "neutral",
-        "stressed": "stressed",
-        "anxious": "anxious",
-        "sad": "sad",
-        "lonely": "lonely",
-        "angry": "angry",
-        "tired / burned out": "tired",
-        "tired/burned out": "tired",
-        "tired": "tired",
-        "overwhelmed": "overwhelmed",
-        "unmotivated / low energy": "unmotivated",
-        "unmotivated": "unmotivated",
-        "low energy": "unmotivated",
-    }
-    if m in mapping:
-        return mapping[m]
-    for key in mapping:
-        if key in m:
-            return mapping[key]
-    return "neutral"
+    if m in MOOD_LABEL_MAPPING:
+        return MOOD_LABEL_MAPPING[m]
+    # the earliest label in the mapping that occurs anywhere in the text
+    first = min((_MOOD_LABEL_ORDER[hit.group(1)] for hit in _MOOD_LABEL_RE.finditer(m)), default=None)
+    return MOOD_LABEL_MAPPING[_MOOD_LABELS[first]] if first is not None else "neutral"
+
+
+# ======================= SESSIONS ===========================
+
+# Private (0700) per-user directory for files holding chats, uploads or results, instead of the CWD
+# or the shared temp dir.
+REPORT_DATA_DIR = os.getenv("REPORT_DATA_DIR") or os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "aiwebcompanion"
+)
+
+# "memory" keeps sessions in this process; "sqlite" shares them between workers on one host.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+# The sqlite backend's file; it is created 0600 when the app starts.
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH") or os.path.join(REPORT_DATA_DIR, "sessions.sqlite3")
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(8 * 1024 * 1024)))
+# both are stored as one-byte counts in the packed record, and at least one is kept
+SESSION_RECENT_MOODS = min(255, max(1, int(os.getenv("SESSION_RECENT_MOODS", "8"))))
+SESSION_RECENT_SERVED = min(255, max(1, int(os.getenv("SESSION_RECENT_SERVED", "32"))))
+
+session_store: Optional[Union[MemorySessionBackend, SqliteSessionBackend]] = None
+
+
+def start_sessions():
+    global session_store
+    if SESSION_BACKEND == "sqlite":
+        os.makedirs(os.path.dirname(os.path.abspath(SESSION_DB_PATH)), mode=0o700, exist_ok=True)
+        session_store = SqliteSessionBackend(
+            SESSION_DB_PATH,
+            max_sessions=SESSION_MAX_SESSIONS,
+            ttl_seconds=SESSION_TTL_SECONDS,
+        )
+    else:
+        session_store = MemorySessionBackend(
+            max_sessions=SESSION_MAX_SESSIONS,
+            max_bytes=SESSION_MAX_BYTES,
+            ttl_seconds=SESSION_TTL_SECONDS,
+        )
+
+
+def stop_sessions():
+    global session_store
+    if isinstance(session_store, SqliteSessionBackend):
+        session_store.close()
+    session_store = None
+
+MOOD_IDS = {mood: i for i, mood in enumerate(SUPPORTIVE_RESPONSES)}
+MOODS_BY_ID = list(SUPPORTIVE_RESPONSES)
+
+# every response string gets a small id so sessions can remember what they were served
+RESPONSE_IDS: Dict[str, int] = {}
+for _texts in (
+    [t for texts in SUPPORTIVE_RESPONSES.values() for t in texts],
+    MINDFULNESS_TECHNIQUES,
+    [t for texts in MENTAL_HEALTH_TIPS_BY_MOOD.values() for t in texts],
+    [t for texts in JOURNALING_PROMPTS_BY_MOOD.values() for t in texts],
+    GENERIC_TIPS,
+    GENERIC_JOURNALING_PROMPTS,
+):
+    for _text in _texts:
+        RESPONSE_IDS.setdefault(_text, len(RESPONSE_IDS))
+
+
+def pick_response(options: List[str], session: Optional[SessionRecord] = None) -> str:
+    """random.choice, but preferring what this session has not been served recently."""
+    if session is None:
+        return random.choice(options)
+    # position of the latest time each response was served; oldest first
+    last_served = {rid: i for i, rid in enumerate(session.served)}
+    fresh = [o for o in options if RESPONSE_IDS[o] not in last_served]
+    if fresh:
+        choice = random.choice(fresh)
+    else:
+        choice = min(options, key=lambda o: last_served[RESPONSE_IDS[o]])
+    session.mark_served(RESPONSE_IDS[choice], SESSION_RECENT_SERVED)
+    return choice
 
 
-def get_supportive_response(mood: str) -> str:
+def load_session(session_id: Optional[str]) -> Tuple[str, SessionRecord]:
+    if not session_id:
+        return uuid.uuid4().hex, SessionRecord()
+    return session_id, session_store.get(session_id) or SessionRecord()
+
+
+def mood_with_context(session: SessionRecord, mood: str, matched_keywords: List[str]) -> str:
+    """
+    A message with no mood keywords keeps the mood of the conversation
+    (e.g. "thanks, what else can I do?" after several stressed messages).
+    """
+    if matched_keywords:
+        return mood
+    for mood_id in reversed(session.moods):
+        if MOODS_BY_ID[mood_id] != "neutral":
+            return MOODS_BY_ID[mood_id]
+    return mood
+
+
+# ======================= REPLIES ============================
+
+def get_supportive_response(mood: str, session: Optional[SessionRecord] = None) -> str:
     mood_key = normalize_mood_label(mood)
     responses = SUPPORTIVE_RESPONSES.get(mood_key, SUPPORTIVE_RESPONSES["neutral"])
-    return random.choice(responses)
+    return pick_response(responses, session)
 
 
-def get_mindfulness_suggestion() -> str:
-    return random.choice(MINDFULNESS_TECHNIQUES)
+def get_mindfulness_suggestion(session: Optional[SessionRecord] = None) -> str:
+    return pick_response(MINDFULNESS_TECHNIQUES, session)
 
 
-def get_mood_tip(mood: str) -> str:
+def get_mood_tip(mood: str, session: Optional[SessionRecord] = None) -> str:
     mood_key = normalize_mood_label(mood)
     tips = MENTAL_HEALTH_TIPS_BY_MOOD.get(mood_key)
-    return random.choice(tips) if tips else random.choice(GENERIC_TIPS)
+    return pick_response(tips or GENERIC_TIPS, session)
 
 
-def get_mood_journaling_prompt(mood: str) -> str:
+def get_mood_journaling_prompt(mood: str, session: Optional[SessionRecord] = None) -> str:
     mood_key = normalize_mood_label(mood)
     prompts = JOURNALING_PROMPTS_BY_MOOD.get(mood_key)
-    return random.choice(prompts) if prompts else random.choice(GENERIC_JOURNALING_PROMPTS)
+    return pick_response(prompts or GENERIC_JOURNALING_PROMPTS, session)
 
 
-def select_fitness_plan(goal: str, activity_level: str, age_group: Optional[str]) -> List[str]:
+def mood_reply_sections(mood: str, session: Optional[SessionRecord] = None):
     """
-    Choose a base plan by goal, then adapt it based on activity level and age.
-    This makes the output clearly different for different combinations.
+    Yield (section, text) pairs of a reply, each picked only when requested,
+    so a streaming client can show the first part before the rest is chosen.
+    """
+    yield "supportive", get_supportive_response(mood, session)
+    yield "mindfulness", get_mindfulness_suggestion(session)
+    yield "tip", f"Tip: {get_mood_tip(mood, session)}"
+    yield "journaling", f"Journaling prompt: {get_mood_journaling_prompt(mood, session)}"
+
+
+def build_mood_reply(mood: str, session: Optional[SessionRecord] = None) -> str:
+    return " ".join(text for _, text in mood_reply_sections(mood, session))
+
+
+def fitness_plan_key(goal: str, activity_level: str, age_group: Optional[str]) -> Tuple[str, str, str]:
+    """
+    Reduce the free-form request fields to the buckets the plan actually depends on.
     """
     g = (goal or "").lower()
     lvl = (activity_level or "").lower()
     age = (age_group or "").lower()
 
-    # 1. Pick base plan by goal
     if "loss" in g:
-        plan = list(WEIGHT_LOSS_BASE)
+        goal_key = "weight_loss"
     elif "muscle" in g or "strength" in g:
-        plan = list(MUSCLE_GAIN_BASE)
+        goal_key = "muscle"
     elif "flexibility" in g or "mobility" in g:
+        goal_key = "flexibility"
+    else:
+        goal_key = "general"
+
+    if "46" in age or "46+" in age:
+        age_key = "46+"
+    elif "18-25" in age or "26-35" in age:
+        age_key = "18-35"
+    elif "36-45" in age:
+        age_key = "36-45"
+    else:
+        age_key = ""
+
+    if "beginner" in lvl:
+        level_key = "beginner"
+    elif "moderate" in lvl:
+        level_key = "moderate"
+    elif "active" in lvl or "high" in lvl:
+        level_key = "active"
+    else:
+        level_key = ""
+
+    return goal_key, level_key, age_key
+
+
+def _build_fitness_plan(goal_key: str, level_key: str, age_key: str) -> List[str]:
+    """
+    Choose a base plan by goal, then adapt it based on activity level and age.
+    This makes the output clearly different for different combinations.
+    """
+    # 1. Pick base plan by goal
+    if goal_key == "weight_loss":
+        plan = list(WEIGHT_LOSS_BASE)
+    elif goal_key == "muscle":
+        plan = list(MUSCLE_GAIN_BASE)
+    elif goal_key == "flexibility":
         plan = list(FLEXIBILITY_BASE)
     else:
         plan = list(GENERAL_FITNESS_BASE)
 
     # 2. Adapt for age group
-    if "46" in age or "46+" in age:
+    if age_key == "46+":
         plan.insert(
             0,
             "Because you selected age 46+, this plan focuses on lower-impact movements and extra warm-up and recovery. "
@@ -335,13 +608,13 @@ def select_fitness_plan(goal: str, activity_level: str, age_group: Optional[str]
             p.replace("jumping jacks (or half-jacks)", "low-impact side steps or gentle marching in place")
             for p in plan
         ]
-    elif "18-25" in age or "26-35" in age:
+    elif age_key == "18-35":
         plan.insert(
             0,
             "This plan balances cardio and strength to build overall fitness for your age group. "
             "Increase duration slowly if it feels comfortable.",
         )
-    elif "36-45" in age:
+    elif age_key == "36-45":
         plan.insert(
             0,
             "For your age group, this plan keeps a mix of moderate-intensity work and recovery days. "
@@ -349,19 +622,19 @@ def select_fitness_plan(goal: str, activity_level: str, age_group: Optional[str]
         )
 
     # 3. Adapt for activity level
-    if "beginner" in lvl:
+    if level_key == "beginner":
         plan.insert(
             1,
             "Because you selected Beginner, aim for about 2–3 active days per week and keep the pace comfortable. "
             "You can skip a round or reduce reps if it feels too much.",
         )
-    elif "moderate" in lvl:
+    elif level_key == "moderate":
         plan.insert(
             1,
             "With a Moderate activity level, aim for about 3–4 active days per week. "
             "Try to complete the listed sets, but it’s fine to take longer rests.",
         )
-    elif "active" in lvl or "high" in lvl:
+    elif level_key == "active":
         plan.insert(
             1,
             "Since you’re already Active, you can gradually increase duration or add an extra round on days you feel strong. "
@@ -371,134 +644,930 @@ def select_fitness_plan(goal: str, activity_level: str, age_group: Optional[str]
     return plan
 
 
+# Every (goal, level, age) bucket is small and finite, so all plans are built once here.
+FITNESS_PLAN_TABLE: Dict[Tuple[str, str, str], Tuple[str, ...]] = {
+    (goal_key, level_key, age_key): tuple(_build_fitness_plan(goal_key, level_key, age_key))
+    for goal_key in ("weight_loss", "muscle", "flexibility", "general")
+    for level_key in ("beginner", "moderate", "active", "")
+    for age_key in ("46+", "18-35", "36-45", "")
+}
+
+
+def select_fitness_plan(goal: str, activity_level: str, age_group: Optional[str]) -> List[str]:
+    return list(FITNESS_PLAN_TABLE[fitness_plan_key(goal, activity_level, age_group)])
+
+
+# Keywords per mood, in priority order: the first mood with a keyword in the message wins.
+MOOD_KEYWORDS = {
+    "stressed": ["stress", "stressed", "pressure", "overload"],
+    "anxious": ["anxious", "anxiety", "panic"],
+    "sad": ["sad", "upset", "depressed", "down"],
+    "angry": ["angry", "mad", "furious"],
+    "lonely": ["lonely", "alone", "no one"],
+    "tired": ["tired", "exhausted", "burned out", "burnt out"],
+    "overwhelmed": ["overwhelmed", "too much"],
+    "unmotivated": ["no motivation", "unmotivated", "lazy"],
+    "happy": ["happy", "good", "excited"],
+}
+
+# A keyword containing another keyword of its mood ("stressed") can never be
+# the first one found, so it is not searched for.
+_MOOD_NEEDLES = [
+    (mood, [w for w in words if not any(other != w and other in w for other in words)])
+    for mood, words in MOOD_KEYWORDS.items()
+]
+# Moods are looked for in the first MOOD_HEAD_CHARS characters before the
+# rest of the message is lowercased, so a keyword near the start of a long
+# paste costs the head alone.
+MOOD_HEAD_CHARS = 1024
+_MOOD_HEAD_OVERLAP = max(len(w) for words in MOOD_KEYWORDS.values() for w in words) - 1
+
+
+def match_mood_keywords(message: str) -> Tuple[str, List[str]]:
+    """
+    The first mood in MOOD_KEYWORDS with a keyword in the message (a plain
+    substring check, case-insensitive), and the keyword found for it; or
+    "neutral" and no keywords.
+
+    Each keyword is one C-level substring search, and the search stops at the
+    first mood found instead of counting every hit, so a long message is read
+    only as far as it takes to decide.
+    """
+    message = message or ""
+    head = message[:MOOD_HEAD_CHARS].lower()
+    text = None
+    for mood, needles in _MOOD_NEEDLES:
+        for w in needles:
+            if w in head:
+                return mood, [w]
+        if len(message) > MOOD_HEAD_CHARS:
+            if text is None:
+                text = message.lower()
+            # the overlap catches a keyword that straddles the end of the head
+            for w in needles:
+                if text.find(w, MOOD_HEAD_CHARS - _MOOD_HEAD_OVERLAP) >= 0:
+                    return mood, [w]
+    return "neutral", []
+
+
+# ===================== MOOD ENGINES =========================
+
+# "keywords" (match_mood_keywords) or "ngram" (the hashed n-gram classifier).
+MOOD_ENGINE = os.getenv("MOOD_ENGINE", "keywords")
+# Per-message budget for the classifier; slower calls are counted on /metrics.
+MOOD_CLASSIFIER_BUDGET_MS = float(os.getenv("MOOD_CLASSIFIER_BUDGET_MS", "2"))
+
+# Built on first use, so the default keyword engine does not pay for it at startup.
+mood_classifier: Optional[MoodClassifier] = None
+
+
+def get_mood_classifier() -> MoodClassifier:
+    global mood_classifier
+    if mood_classifier is None:
+        # two threads racing here both build the same table; either one is kept
+        mood_classifier = MoodClassifier(
+            build_lexicon(MOOD_KEYWORDS),
+            list(MOOD_KEYWORDS) + ["neutral"],
+            max_tokens=int(os.getenv("MOOD_CLASSIFIER_MAX_TOKENS", "256")),
+        )
+    return mood_classifier
+
+
+def match_mood_ngrams(message: str) -> Tuple[str, List[str]]:
+    """Same contract as match_mood_keywords; "matched" lists the features behind the label."""
+    start = time.perf_counter()
+    result = get_mood_classifier().classify(message, explain=True)
+    mood = result["mood"]
+    matched = [] if mood == "neutral" else result["matched"]
+    if (time.perf_counter() - start) * 1000 > MOOD_CLASSIFIER_BUDGET_MS:
+        MOOD_CLASSIFIER_OVER_BUDGET.inc()
+    return mood, matched
+
+
+MOOD_ENGINES = {"keywords": match_mood_keywords, "ngram": match_mood_ngrams}
+if MOOD_ENGINE not in MOOD_ENGINES:
+    raise RuntimeError(f"MOOD_ENGINE must be one of {sorted(MOOD_ENGINES)}, not {MOOD_ENGINE!r}")
+if MOOD_ENGINE == "ngram":
+    get_mood_classifier()
+
+
+def detect_mood(message: str) -> Tuple[str, List[str]]:
+    return MOOD_ENGINES[MOOD_ENGINE](message)
+
+
 def detect_mood_from_message(message: str) -> str:
-    text = (message or "").lower()
-    if any(w in text for w in ["stress", "stressed", "pressure", "overload"]):
-        return "stressed"
-    if any(w in text for w in ["anxious", "anxiety", "panic"]):
-        return "anxious"
-    if any(w in text for w in ["sad", "upset", "depressed", "down"]):
-        return "sad"
-    if any(w in text for w in ["angry", "mad", "furious"]):
-        return "angry"
-    if any(w in text for w in ["lonely", "alone", "no one"]):
-        return "lonely"
-    if any(w in text for w in ["tired", "exhausted", "burned out", "burnt out"]):
-        return "tired"
-    if any(w in text for w in ["overwhelmed", "too much"]):
-        return "overwhelmed"
-    if any(w in text for w in ["no motivation", "unmotivated", "lazy"]):
-        return "unmotivated"
-    if any(w in text for w in ["happy", "good", "excited"]):
-        return "happy"
-    return "neutral"
-
-
-# ================ REPORT TEXT EXTRACTION ====================
-
-def extract_text_from_docx_bytes(raw: bytes) -> str:
-    file_like = io.BytesIO(raw)
-    doc = Document(file_like)
-    paragraphs = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
-    return "\n".join(paragraphs)
-
-
-def extract_text_from_pdf_bytes(raw: bytes) -> str:
-    file_like = io.BytesIO(raw)
-    reader = PdfReader(file_like)
-    pages_text = []
-    for page in reader.pages[:5]:
+    return detect_mood(message)[0]
+
+
+# ==================== UPLOAD INTAKE =========================
+
+# Hard cap on a report upload; anything larger is rejected with 413.
+REPORT_MAX_UPLOAD_BYTES = int(os.getenv("REPORT_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# Room for the multipart boundary and part headers on top of the file itself.
+REPORT_MULTIPART_OVERHEAD_BYTES = 16 * 1024
+# Async job payloads larger than this are handed to the parser processes as a temp file.
+# It does not affect the sync route: there Starlette's multipart parser decides, and it
+# keeps each file in memory up to its own fixed 1MB (MultiPartParser.spool_max_size).
+REPORT_SPOOL_THRESHOLD_BYTES = int(os.getenv("REPORT_SPOOL_THRESHOLD_BYTES", str(1024 * 1024)))
+REPORT_READ_CHUNK_BYTES = int(os.getenv("REPORT_READ_CHUNK_BYTES", str(64 * 1024)))
+
+
+class UploadLimit:
+    """
+    ASGI wrapper for an upload route. Form parsing reads and spools the whole
+    body before the handler runs, so the cap is enforced here, before that:
+    on the declared Content-Length at once, and on the bytes actually
+    received as they arrive (for chunked or understated bodies).
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                raise HTTPException(status_code=413, detail="Uploaded file is too large.")
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="Uploaded file is too large.")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def limit_upload_route(path: str, max_bytes: int) -> None:
+    for route in app.routes:
+        if getattr(route, "path", None) == path and "POST" in getattr(route, "methods", ()):
+            route.app = UploadLimit(route.app, max_bytes)
+
+
+def _reopen_path(fileno: int) -> Optional[str]:
+    """A path the parser processes can open to read this process's (unnamed) temp file, where /proc has one."""
+    path = f"/proc/{os.getpid()}/fd/{fileno}"
+    return path if os.path.exists(path) else None
+
+
+class UploadPayload:
+    """
+    An upload hashed and sized without copying it. Starlette keeps small
+    uploads in memory and rolls larger ones to a temp file; `data` is then
+    Starlette's own bytes or a read-only mmap of that file, and `source`
+    (what gets handed to a parser process) the bytes or a path that reopens
+    the same file. Only without /proc is a large upload copied, to a named
+    temp file. `peak_bytes` is the most this process held in memory to take
+    the upload in, Starlette's buffer included.
+    """
+
+    def __init__(self):
+        self.data = b""
+        self.size = 0
+        self.peak_bytes = 0
+        self.sha256 = ""
+        self.path: Optional[str] = None
+        self._copy = None
+
+    @property
+    def source(self):
+        return self.path if self.path is not None else self.data
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        if self._copy is not None:
+            self._copy.close()
+            self._copy = None
+        self.data = b""
+
+
+async def read_upload_limited(file: UploadFile) -> UploadPayload:
+    payload = UploadPayload()
+    spooled = file.file
+    # Starlette's SpooledTemporaryFile has not rolled over to disk
+    in_memory = not getattr(spooled, "_rolled", True)
+    digest = hashlib.sha256()
+    try:
+        if in_memory:
+            # BytesIO.getvalue() hands out its own buffer when it can, so the
+            # parsers share the bytes Starlette already holds instead of a copy
+            payload.data = spooled._file.getvalue()
+            payload.size = len(payload.data)
+            if payload.size > REPORT_MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail="Uploaded file is too large.")
+            digest.update(payload.data)
+            payload.sha256 = digest.hexdigest()
+            payload.peak_bytes = payload.size
+            return payload
+
+        payload.path = _reopen_path(spooled.fileno())
+        if payload.path is None:
+            payload._copy = tempfile.NamedTemporaryFile(prefix="report-")
+        await file.seek(0)
+        while True:
+            chunk = await file.read(REPORT_READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            payload.size += len(chunk)
+            if payload.size > REPORT_MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail="Uploaded file is too large.")
+            digest.update(chunk)
+            if payload._copy is not None:
+                payload._copy.write(chunk)
+
+        payload.sha256 = digest.hexdigest()
+        if payload._copy is not None:
+            payload._copy.flush()
+            payload.path = payload._copy.name
+            spooled = payload._copy
+        if payload.size:
+            payload.data = mmap.mmap(spooled.fileno(), 0, access=mmap.ACCESS_READ)
+        # Starlette held the upload in memory up to its spool size before
+        # rolling it to disk; the chunks read here come after that is freed
+        spool_bytes = getattr(file.file, "_max_size", 0) or payload.size
+        payload.peak_bytes = min(payload.size, max(spool_bytes, REPORT_READ_CHUNK_BYTES))
+    except BaseException:
+        payload.close()
+        raise
+    return payload
+
+
+def extract_text_from_upload(file: UploadFile, raw: bytes) -> str:
+    return extract_text_by_name(file.filename, raw)
+
+
+# ================ REPORT PIPELINE ===========================
+
+async def process_pdf_report_parallel(
+    loop, filename: str, source, deadline: Optional[float] = None
+) -> Tuple[dict, dict]:
+    """
+    Like process_report for PDFs, but the pages after the first task's are
+    split into one chunk per pool worker, run concurrently. Every chunk parses
+    the PDF again, so chunks are sized from the worker count rather than kept
+    small. Chunks are merged in page order and merging stops at the same page
+    the sequential early exit would, so the result does not depend on the pool
+    size. Past `deadline` the pages finished so far are analyzed.
+    """
+    stats = {"stages": {}, "pdf_page_failures": 0}
+    start = time.perf_counter()
+    min_per_task = max(1, REPORT_PDF_PAGES_PER_TASK)
+    pages: List[str] = []
+    readings: List[dict] = []
+    found = set()
+    offset = 0
+    timed_out = False
+
+    def merge(chunk) -> bool:
+        nonlocal offset, timed_out
+        if chunk is None or chunk["timed_out"]:
+            # a chunk the budget cut short; pages finished by later chunks are still used
+            timed_out = True
+            if chunk is None:
+                return False
+        stats["pdf_page_failures"] += chunk["failures"]
+        for text, page_readings in chunk["pages"]:
+            for r in page_readings:
+                readings.append(dict(r, offset=r["offset"] + offset))
+            pages.append(text)
+            offset += len(text) + 1
+            if REPORT_PDF_EARLY_EXIT:
+                found.update(r["analyte"] for r in page_readings)
+                if found >= REPORT_PDF_EARLY_EXIT_TARGETS:
+                    return True
+        return False
+
+    # the first task also tells us how many pages there are; a PDF no longer
+    # than it reads is done without splitting
+    (first,) = await gather_by_deadline(deadline, [
+        report_call(loop, extract_pdf_pages, source, 0, min(min_per_task, REPORT_PDF_MAX_PAGES), deadline),
+    ])
+    page_count = first["page_count"] if first is not None and first["page_count"] is not None else 0
+    budget = min(page_count, REPORT_PDF_MAX_PAGES)
+    next_page = min(min_per_task, budget)
+    done = merge(first)
+
+    if not done and not timed_out and next_page < budget:
+        if deadline_passed(deadline):
+            timed_out = True
+        else:
+            per_task = max(min_per_task, math.ceil((budget - next_page) / max(1, REPORT_WORKERS)))
+            chunks = await gather_by_deadline(deadline, [
+                report_call(loop, extract_pdf_pages, source, p, min(p + per_task, budget), deadline)
+                for p in range(next_page, budget, per_task)
+            ])
+            for chunk in chunks:
+                if merge(chunk):
+                    break
+
+    if timed_out:
+        stats["timed_out"] = True
+    stats["stages"]["extract"] = time.perf_counter() - start
+    return build_report_result("\n".join(pages), stats, readings), stats
+
+
+# ================ REPORT RESULT CACHE =======================
+
+REPORT_CACHE_TTL_SECONDS = float(os.getenv("REPORT_CACHE_TTL_SECONDS", "3600"))
+# A SQLite file shared by all uvicorn workers on the host; unset keeps the cache per process.
+REPORT_CACHE_PATH = os.getenv("REPORT_CACHE_PATH") or None
+
+report_cache = ReportCache(
+    max_entries=int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "256")),
+    max_bytes=int(os.getenv("REPORT_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    ttl_seconds=REPORT_CACHE_TTL_SECONDS,
+    shared=SharedCache(
+        REPORT_CACHE_PATH,
+        max_bytes=int(os.getenv("REPORT_CACHE_SHARED_MAX_BYTES", str(128 * 1024 * 1024))),
+        ttl_seconds=REPORT_CACHE_TTL_SECONDS,
+    ) if REPORT_CACHE_PATH else None,
+)
+
+
+def report_cache_key(filename: str, sha256: str) -> str:
+    # the extension picks the parser, so the same bytes under another extension differ
+    ext = os.path.splitext((filename or "").lower())[1]
+    tables = "-t" if REPORT_DOCX_TABLES else ""
+    # a narrower early exit reads fewer pages of the same PDF
+    targets = sorted(REPORT_PDF_EARLY_EXIT_TARGETS)
+    early = "" if REPORT_PDF_EARLY_EXIT_TARGETS == LAB_TARGETS else f"-e{zlib.crc32(','.join(targets).encode()):08x}"
+    return f"v{ANALYZER_VERSION}-p{REPORT_PDF_MAX_PAGES}{tables}{early}:{ext}:{sha256}"
+
+
+REPORT_GENERAL_GUIDANCE = [
+    "I am not a doctor and cannot provide a diagnosis or prescribe medicines.",
+    "Please discuss this report with a qualified healthcare professional for accurate interpretation.",
+    "If you have serious symptoms like chest pain, trouble breathing, severe pain, or confusion, seek emergency medical help immediately.",
+    "In general, follow your doctor's instructions, take medicines only as prescribed, rest adequately, stay hydrated, and maintain a balanced diet.",
+    "For borderline blood pressure or cholesterol, lifestyle changes such as regular physical activity, balanced diet, stress management, and avoiding smoking are often recommended — but your doctor is the best person to guide you.",
+]
+
+
+REPORT_GUIDANCE_FRAGMENT = object_fragment({"general_advice": REPORT_GENERAL_GUIDANCE})
+
+
+def report_response_body(file_name: str, result: dict) -> bytes:
+    """The encoded /health/report body, shared by the sync route and finished async jobs."""
+    return splice(
+        {
+            "file_name": file_name,
+            "summary": result["summary"],
+            "values": result["values"],
+            "partial": result.get("partial", False),
+        },
+        REPORT_GUIDANCE_FRAGMENT,
+    )
+
+
+# ==================== LAB HISTORY ===========================
+
+# Off by default. Users are told apart only by the X-User-Id header, which this
+# app does not authenticate: enable it only behind a proxy that authenticates
+# the caller, sets X-User-Id itself and drops any X-User-Id the client sent.
+# Otherwise anyone can read or add to anyone's lab values.
+# Append-only log of each user's lab values, shared by the workers on the host;
+# setting it enables the history. LAB_HISTORY=1 alone keeps it in memory only.
+LAB_HISTORY_PATH = os.getenv("LAB_HISTORY_PATH") or None
+LAB_HISTORY_ENABLED = os.getenv("LAB_HISTORY", "0") == "1" or LAB_HISTORY_PATH is not None
+LAB_HISTORY_MAX_POINTS = int(os.getenv("LAB_HISTORY_MAX_POINTS", "100"))
+
+# opened by the lifespan handler, so importing main reads no log
+lab_history: Optional[LabHistoryStore] = None
+
+
+def start_lab_history():
+    global lab_history
+    if LAB_HISTORY_ENABLED:
+        lab_history = LabHistoryStore(LAB_HISTORY_PATH)
+
+
+def stop_lab_history():
+    global lab_history
+    lab_history = None
+
+
+def report_user_id(request: Request) -> Optional[str]:
+    """
+    The caller's X-User-Id, as set by the authenticating proxy (see above);
+    reports sent without one are not added to any history.
+    """
+    user_id = request.headers.get("x-user-id", "").strip()
+    if len(user_id) > 64:
+        raise HTTPException(status_code=400, detail="X-User-Id must be at most 64 characters.")
+    return user_id or None
+
+
+def record_lab_history(user_id: Optional[str], sha256: str, timestamp: float, result: dict) -> None:
+    if lab_history is not None and user_id and result.get("values"):
+        lab_history.append(user_id, sha256, timestamp, result["values"])
+
+
+# ================ REPORT WORKER POOL ========================
+
+# Number of parser processes; 0 runs parsing on the default thread pool instead.
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Time budget in seconds for extracting and analyzing one report, per route
+# (0 disables it). When it runs out the work is stopped and the pages read so
+# far are analyzed and returned with "partial": true.
+REPORT_BUDGETS = {
+    "report": float(os.getenv("REPORT_BUDGET_SECONDS", "20")),
+    "report_job": float(os.getenv("REPORT_JOB_BUDGET_SECONDS", "120")),
+}
+# How long past the budget to wait for workers to hand back their partial pages.
+REPORT_BUDGET_GRACE_SECONDS = float(os.getenv("REPORT_BUDGET_GRACE_SECONDS", "0.5"))
+
+report_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _warm_report_worker():
+    # import the parsers (and lxml behind python-docx) before the first real job
+    for module in REPORT_PARSER_MODULES:
+        startup.lazy_import(module)
+
+
+def _noop() -> None:
+    return None
+
+
+def _new_report_pool() -> ProcessPoolExecutor:
+    executor = ProcessPoolExecutor(
+        max_workers=REPORT_WORKERS,
+        initializer=_warm_report_worker,
+    )
+    # Processes are spawned on demand; submit one no-op per worker so they
+    # are all forked now, before the warm-up thread starts importing in
+    # this process (a fork mid-import leaves a half-initialized module).
+    for _ in range(REPORT_WORKERS):
+        executor.submit(_noop)
+    return executor
+
+
+def start_report_pool():
+    global report_executor
+    if REPORT_WORKERS > 0:
+        report_executor = _new_report_pool()
+    startup.mark_app_started()
+    if STARTUP_WARMUP:
+        startup.start_warmup(REPORT_PARSER_MODULES)
+
+
+def stop_report_pool():
+    global report_executor
+    if report_executor is not None:
+        report_executor.shutdown(wait=False, cancel_futures=True)
+        report_executor = None
+    report_cache.close()
+
+
+async def restart_report_pool(broken) -> None:
+    """Replace a pool that lost a worker (segfault, OOM kill); every later call would fail on it."""
+    global report_executor
+    if broken is None or report_executor is not broken:
+        return  # no pool (parsing on threads), or another request already replaced it
+    logger.error("a report worker died; restarting the report pool")
+    REPORT_POOL_RESTARTS.inc()
+    report_executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+    # the new workers are forked from this process, so not in the middle of the warm-up imports
+    await asyncio.get_running_loop().run_in_executor(None, startup.wait_for_warmup)
+    report_executor = _new_report_pool()
+
+
+async def report_call(loop, fn, *args):
+    """
+    Run fn(*args) on the report pool; sampled there too when the request is
+    being profiled. If the pool broke under it, the pool is rebuilt and the
+    request gets a 503.
+    """
+    executor = report_executor
+    try:
+        profile = current_profile.get()
+        if profile is None:
+            return await loop.run_in_executor(executor, fn, *args)
+        return await _profiled_report_call(loop, profile, executor, fn, args)
+    except BrokenExecutor:
+        await restart_report_pool(executor)
+        raise HTTPException(
+            status_code=503,
+            detail="The report could not be analyzed right now. Please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def _profiled_report_call(loop, profile, executor, fn, args):
+    result, stacks = await loop.run_in_executor(executor, profile_call, profile.interval, fn, *args)
+    profile.add(stacks)
+    return result
+
+
+async def gather_by_deadline(deadline: Optional[float], calls) -> list:
+    """
+    Like asyncio.gather, but only waits until `deadline` (plus the grace);
+    calls that have not finished by then are cancelled and give None.
+    """
+    tasks = [asyncio.ensure_future(call) for call in calls]
+    if deadline is None:
+        return await asyncio.gather(*tasks)
+    timeout = max(deadline - time.monotonic(), 0) + REPORT_BUDGET_GRACE_SECONDS
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    return [task.result() if task in done else None for task in tasks]
+
+
+async def run_report_job(filename: str, source, route: str) -> dict:
+    """
+    Run process_report on the pool within the route's time budget and record
+    its stage metrics here. A result cut short by the budget is marked partial.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = deadline_after(REPORT_BUDGETS[route])
+    with stage_timer("job"):
+        # with one parser process there is nothing to split a PDF across
+        if (filename or "").lower().endswith(".pdf") and REPORT_WORKERS > 1:
+            result, stats = await process_pdf_report_parallel(loop, filename, source, deadline)
+        else:
+            (finished,) = await gather_by_deadline(deadline, [
+                report_call(loop, process_report, filename, source, deadline),
+            ])
+            if finished is None:
+                stats = {"timed_out": True}
+                result = build_report_result("", stats)
+            else:
+                result, stats = finished
+    record_report_stats(stats)
+    if stats.get("timed_out"):
+        REPORT_BUDGET_EXHAUSTED.inc(route)
+        mark_report_partial(result)
+    return result
+
+
+# ================ REPORT ADMISSION CONTROL ==================
+
+report_admission = AdmissionController(
+    max_concurrent=int(os.getenv("REPORT_MAX_CONCURRENT", "4")),
+    max_bytes=int(os.getenv("REPORT_MAX_INFLIGHT_BYTES", str(32 * 1024 * 1024))),
+    max_queued=int(os.getenv("REPORT_MAX_QUEUED", "16")),
+    max_queued_per_client=int(os.getenv("REPORT_MAX_QUEUED_PER_CLIENT", "4")),
+    queue_timeout=float(os.getenv("REPORT_QUEUE_TIMEOUT_SECONDS", "30")),
+)
+
+
+def report_client_key(request: Request) -> str:
+    # used only for fair queuing, so the peer address is good enough
+    return request.client.host if request.client else "unknown"
+
+
+@asynccontextmanager
+async def admit_report(request: Request):
+    declared = request.headers.get("content-length")
+    nbytes = int(declared) if declared and declared.isdigit() else 0
+    try:
+        async with report_admission.admit(report_client_key(request), nbytes):
+            yield
+    except AdmissionRejected as e:
+        detail = (
+            "You already have several reports waiting. Please try again shortly."
+            if e.status_code == 429
+            else "Too many reports are being analyzed. Please try again shortly."
+        )
+        raise HTTPException(status_code=e.status_code, detail=detail, headers={"Retry-After": str(e.retry_after)})
+
+
+# ================ ASYNC REPORT JOBS =========================
+
+# Opt-in with `?mode=async` or `Prefer: respond-async`: the upload is queued in
+# SQLite and the client polls (or long-polls) the job instead of holding the
+# connection open for the whole analysis.
+# The queue holds the raw uploads; it is created 0600 when the app starts.
+REPORT_JOBS_PATH = os.getenv("REPORT_JOBS_PATH") or os.path.join(REPORT_DATA_DIR, "report_jobs.sqlite3")
+REPORT_JOB_RUNNERS = int(os.getenv("REPORT_JOB_RUNNERS", "2"))
+REPORT_JOB_MAX_PENDING = int(os.getenv("REPORT_JOB_MAX_PENDING", "100"))
+REPORT_JOB_MAX_WAIT_SECONDS = float(os.getenv("REPORT_JOB_MAX_WAIT_SECONDS", "30"))
+# How often idle runners and waiters re-check the store for work done by other processes.
+REPORT_JOB_POLL_SECONDS = float(os.getenv("REPORT_JOB_POLL_SECONDS", "1.0"))
+
+REPORT_JOB_TTL_SECONDS = float(os.getenv("REPORT_JOB_TTL_SECONDS", "3600"))
+REPORT_JOB_LEASE_SECONDS = float(os.getenv("REPORT_JOB_LEASE_SECONDS", "300"))
+
+# opened by the startup hook, so importing main (benchmarks, the bulk CLI) creates no files
+report_jobs: Optional[ReportJobStore] = None
+report_job_wakeup = asyncio.Event()
+report_job_events: Dict[str, asyncio.Event] = {}
+report_job_tasks: List[asyncio.Task] = []
+report_jobs_claimed = set()
+
+
+def wants_async_report(request: Request) -> bool:
+    if request.query_params.get("mode") == "async":
+        return True
+    return "respond-async" in request.headers.get("prefer", "").lower()
+
+
+async def run_claimed_report_job(job: dict) -> None:
+    loop = asyncio.get_running_loop()
+    job_id = job["id"]
+    spool = None
+    try:
+        cache_key = report_cache_key(job["file_name"], job["sha256"])
+        result = report_cache.get(cache_key)
+        if result is None:
+            source = job["payload"]
+            if len(source) > REPORT_SPOOL_THRESHOLD_BYTES:
+                # hand large uploads to the parser processes by path, as the sync route does
+                spool = tempfile.NamedTemporaryFile(prefix="report-")
+                spool.write(source)
+                spool.flush()
+                source = spool.name
+            result = await run_report_job(job["file_name"], source, "report_job")
+            if not result.get("partial"):
+                report_cache.put(cache_key, result)
+        await loop.run_in_executor(None, report_jobs.finish, job_id, result)
+        REPORT_JOBS_FINISHED.inc(DONE)
+        record_lab_history(job["user_id"], job["sha256"], job["created_at"], result)
+    except asyncio.CancelledError:
+        # left in report_jobs_claimed so shutdown can requeue it
+        raise
+    except Exception as e:
+        logger.exception("report job %s failed", job_id)
+        detail = e.detail if isinstance(e, HTTPException) else "The report could not be analyzed."
+        await loop.run_in_executor(None, report_jobs.fail, job_id, str(detail))
+        REPORT_JOBS_FINISHED.inc(FAILED)
+    finally:
+        if spool is not None:
+            spool.close()
+    report_jobs_claimed.discard(job_id)
+    event = report_job_events.pop(job_id, None)
+    if event is not None:
+        event.set()
+
+
+async def report_job_runner() -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        report_job_wakeup.clear()
         try:
-            pages_text.append(page.extract_text() or "")
+            job = await loop.run_in_executor(None, report_jobs.claim)
         except Exception:
+            logger.exception("claiming a report job failed")
+            job = None
+        if job is None:
+            try:
+                await asyncio.wait_for(report_job_wakeup.wait(), REPORT_JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
             continue
-    return "\n".join(pages_text)
+        report_jobs_claimed.add(job["id"])
+        await run_claimed_report_job(job)
 
 
-def extract_text_from_upload(file: UploadFile, raw: bytes) -> str:
-    name = (file.filename or "").lower()
-    if name.endswith(".docx"):
-        return extract_text_from_docx_bytes(raw)
-    if name.endswith(".pdf"):
-        return extract_text_from_pdf_bytes(raw)
+async def report_job_janitor() -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(60)
+        try:
+            purged = await loop.run_in_executor(None, report_jobs.purge_expired)
+        except Exception:
+            logger.exception("purging report jobs failed")
+            continue
+        if purged:
+            logger.info("purged %d expired report jobs", purged)
+
+
+async def start_report_job_runners():
+    global report_jobs
+    os.makedirs(os.path.dirname(os.path.abspath(REPORT_JOBS_PATH)), mode=0o700, exist_ok=True)
+    report_jobs = ReportJobStore(
+        REPORT_JOBS_PATH,
+        ttl_seconds=REPORT_JOB_TTL_SECONDS,
+        lease_seconds=REPORT_JOB_LEASE_SECONDS,
+    )
+    report_job_tasks.extend(asyncio.create_task(report_job_runner()) for _ in range(REPORT_JOB_RUNNERS))
+    report_job_tasks.append(asyncio.create_task(report_job_janitor()))
+
+
+async def stop_report_job_runners():
+    global report_jobs
+    for task in report_job_tasks:
+        task.cancel()
+    await asyncio.gather(*report_job_tasks, return_exceptions=True)
+    report_job_tasks.clear()
+    # jobs interrupted mid-analysis go back to the queue for the next start
+    report_jobs.release(report_jobs_claimed)
+    report_jobs_claimed.clear()
+    report_jobs.close()
+    report_jobs = None
+
+
+async def submit_report_job(file: UploadFile, user_id: Optional[str]) -> dict:
+    loop = asyncio.get_running_loop()
+    if await loop.run_in_executor(None, report_jobs.pending) >= REPORT_JOB_MAX_PENDING:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many reports are waiting to be analyzed. Please try again shortly.",
+            headers={"Retry-After": "30"},
+        )
+    with stage_timer("read"):
+        payload = await read_upload_limited(file)
     try:
-        return raw.decode("utf-8", errors="ignore")
-    except Exception:
-        return ""
-
-
-# ================ SIMPLE "AI" REPORT ANALYSIS =================
-
-def analyze_report_text(text: str) -> List[str]:
-    findings = []
-    lower = text.lower()
-
-    bp_match = re.search(r"(\d{2,3})\s*/\s*(\d{2,3})\s*mmhg", lower)
-    if bp_match:
-        sys = int(bp_match.group(1))
-        dia = int(bp_match.group(2))
-        if sys >= 140 or dia >= 90:
-            findings.append(
-                f"Blood pressure appears elevated around {sys}/{dia} mmHg, "
-                "which can be consistent with high blood pressure. Only a doctor can accurately interpret this."
-            )
-
-    chol_match = re.search(r"cholesterol.*?(\d+)\s*mg/dl", lower)
-    if chol_match:
-        total_chol = int(chol_match.group(1))
-        if total_chol > 200:
-            findings.append(
-                f"Total cholesterol is around {total_chol} mg/dL, which is above common reference ranges."
-            )
-
-    ldl_match = re.search(r"ldl.*?(\d+)\s*mg/dl", lower)
-    if ldl_match:
-        ldl = int(ldl_match.group(1))
-        if ldl > 130:
-            findings.append(
-                f"LDL (often called 'bad' cholesterol) is about {ldl} mg/dL, which is higher than many guidelines suggest."
-            )
-
-    hdl_match = re.search(r"hdl.*?(\d+)\s*mg/dl", lower)
-    if hdl_match:
-        hdl = int(hdl_match.group(1))
-        if hdl < 40:
-            findings.append(
-                f"HDL (sometimes called 'good' cholesterol) is around {hdl} mg/dL, which can be on the lower side."
-            )
-
-    tri_match = re.search(r"triglycerides.*?(\d+)\s*mg/dl", lower)
-    if tri_match:
-        tri = int(tri_match.group(1))
-        if tri > 150:
-            findings.append(
-                f"Triglycerides are about {tri} mg/dL, which is somewhat higher than typical reference values."
-            )
-
-    return findings
+        # a cached result makes the job complete on arrival
+        cached = report_cache.get(report_cache_key(file.filename, payload.sha256))
+        job_id = await loop.run_in_executor(
+            None, report_jobs.create, file.filename or "", payload.sha256, payload.data, cached, user_id
+        )
+    finally:
+        payload.close()
+    if cached is None:
+        report_job_wakeup.set()
+    else:
+        record_lab_history(user_id, payload.sha256, time.time(), cached)
+    return {"job_id": job_id, "status": DONE if cached is not None else "queued"}
+
+
+async def wait_for_report_job(job_id: str, timeout: float) -> Optional[dict]:
+    """Return the job once it is finished or `timeout` runs out, whichever is first."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        job = await loop.run_in_executor(None, report_jobs.get, job_id)
+        remaining = deadline - loop.time()
+        if job is None or job["status"] in (DONE, FAILED) or remaining <= 0:
+            return job
+        event = report_job_events.setdefault(job_id, asyncio.Event())
+        try:
+            # the event covers jobs run here; the poll covers other workers
+            await asyncio.wait_for(event.wait(), min(remaining, REPORT_JOB_POLL_SECONDS))
+        except asyncio.TimeoutError:
+            pass
+
+
+def report_job_response(job: dict) -> bytes:
+    body = {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "file_name": job["file_name"],
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+    }
+    if job["status"] == DONE:
+        return splice(body, b'"result":' + report_response_body(job["file_name"], job["result"]))
+    if job["status"] == FAILED:
+        body["error"] = job["error"]
+    return dumps(body)
+
+
+# ================ FITNESS PLAN RESPONSES ====================
+
+FITNESS_CACHE_CONTROL = os.getenv("FITNESS_CACHE_CONTROL", "public, max-age=3600")
+
+
+def _plan_fragment(plan: Tuple[str, ...]) -> bytes:
+    # '"plan":[...],"tips":[...]', ready to splice after the echoed fields
+    return object_fragment({"plan": list(plan), "tips": FITNESS_TIPS})
+
+
+# bucket -> (pre-serialized plan/tips fragment, digest used in the ETag)
+FITNESS_PLAN_BODIES: Dict[Tuple[str, str, str], Tuple[bytes, str]] = {}
+for _key, _plan in FITNESS_PLAN_TABLE.items():
+    _fragment = _plan_fragment(_plan)
+    FITNESS_PLAN_BODIES[_key] = (_fragment, hashlib.blake2b(_fragment, digest_size=12).hexdigest())
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def fitness_plan_response(
+    goal: str,
+    activity_level: str,
+    age_group: Optional[str],
+    if_none_match: Optional[str] = None,
+) -> Response:
+    fragment, digest = FITNESS_PLAN_BODIES[fitness_plan_key(goal, activity_level, age_group)]
+    # the request fields are echoed back, so they are part of the entity tag too
+    echo = {"goal": goal, "activity_level": activity_level, "age_group": age_group}
+    etag = f'"{digest}-{zlib.crc32(dumps(echo)):08x}"'
+    headers = {"ETag": etag, "Cache-Control": FITNESS_CACHE_CONTROL}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return json_response(splice(echo, fragment), headers=headers)
+
+
+# ======================= BATCHES ============================
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+
+
+def run_batch(items: List[Any], model, handler) -> dict:
+    """
+    Validate and handle each item on its own so one bad item does not fail
+    the batch. Results come back in request order.
+    """
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(items)} items; the maximum is {BATCH_MAX_ITEMS}.",
+        )
+    results = []
+    for item in items:
+        if not isinstance(item, dict):
+            results.append({"ok": False, "error": "Each item must be a JSON object."})
+            continue
+        try:
+            req = model(**item)
+        except ValidationError as e:
+            results.append({
+                "ok": False,
+                "error": "Invalid item.",
+                "detail": [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()],
+            })
+            continue
+        try:
+            results.append({"ok": True, "result": handler(req)})
+        except Exception:
+            logger.exception("batch item failed")
+            results.append({"ok": False, "error": "Could not process this item."})
+    return {"results": results}
+
+
+# ==================== STREAMED REPLIES ======================
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
+
+
+async def stream_mood_reply(request: Request, mood: str, session=None):
+    """
+    Server-Sent Events: one `section` event per reply part, then `done`
+    with the joined reply. Stops early if the client goes away. A chatbox
+    session is saved once the whole reply has been sent.
+    """
+    parts = []
+    try:
+        for name, text in mood_reply_sections(mood, session[1] if session else None):
+            if await request.is_disconnected():
+                logger.info("reply stream stopped: client disconnected")
+                return
+            parts.append(text)
+            yield sse_event("section", {"section": name, "text": text})
+        if session:
+            session_store.put(*session)
+        yield sse_event("done", {"reply": " ".join(parts)})
+    except asyncio.CancelledError:
+        logger.info("reply stream cancelled after %d sections", len(parts))
+        raise
 
 
 # ========================= ROUTES ===========================
 
 @app.get("/")
 def root():
-    return {"status": "ok", "message": "AI Well-Being backend running"}
+    return {"status": "ok", "message": "AI Well-Being backend running", "ready": startup.is_ready()}
+
+
+@app.get("/startup")
+def startup_report():
+    return startup.report()
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/chatbox/sessions")
+def chatbox_session_stats():
+    return session_store.stats()
+
+
+@app.get("/health/report/cache")
+def report_cache_stats():
+    return report_cache.stats()
+
+
+@app.get("/health/report/admission")
+def report_admission_stats():
+    return report_admission.stats()
 
 
 @app.post("/chat/mood")
 def chat_mood(req: MoodRequest):
-    supportive = get_supportive_response(req.mood)
-    mindfulness = get_mindfulness_suggestion()
-    tip = get_mood_tip(req.mood)
-    journaling = get_mood_journaling_prompt(req.mood)
-
-    reply = (
-        f"{supportive} "
-        f"{mindfulness} "
-        f"Tip: {tip} "
-        f"Journaling prompt: {journaling}"
-    )
-    return {"reply": reply}
+    return json_response({"reply": build_mood_reply(req.mood)})
 
 
 @app.post("/fitness/plan")
@@ -506,79 +1575,169 @@ def fitness_plan(req: FitnessRequest):
     """
     Returns a plan that adapts to goal + activity level + age group.
     """
-    plan = select_fitness_plan(req.goal, req.activity_level, req.age_group)
-    return {
-        "goal": req.goal,
-        "activity_level": req.activity_level,
-        "age_group": req.age_group,
-        "plan": plan,
-        "tips": FITNESS_TIPS,
-    }
+    return fitness_plan_response(req.goal, req.activity_level, req.age_group)
+
+
+@app.get("/fitness/plan")
+def fitness_plan_cached(
+    request: Request,
+    goal: str,
+    activity_level: str,
+    age_group: Optional[str] = None,
+):
+    """
+    Cacheable variant of POST /fitness/plan; honours If-None-Match with a 304.
+    """
+    return fitness_plan_response(goal, activity_level, age_group, request.headers.get("if-none-match"))
+
+
+def chatbox_reply(req: ChatboxRequest) -> dict:
+    message = req.message or ""
+    session_id, session = load_session(req.session_id)
+    detected_mood, matched_keywords = detect_mood(message)
+    detected_mood = mood_with_context(session, detected_mood, matched_keywords)
+    logger.debug("chatbox mood=%s keywords=%s", detected_mood, matched_keywords)
+    session.add_mood(MOOD_IDS[detected_mood], SESSION_RECENT_MOODS)
+    reply = build_mood_reply(detected_mood, session)
+    session_store.put(session_id, session)
+    return {"reply": reply, "session_id": session_id}
 
 
 @app.post("/chatbox")
 def chatbox(req: ChatboxRequest):
-    message = req.message or ""
-    detected_mood = detect_mood_from_message(message)
-
-    supportive = get_supportive_response(detected_mood)
-    mindfulness = get_mindfulness_suggestion()
-    tip = get_mood_tip(detected_mood)
-    journaling = get_mood_journaling_prompt(detected_mood)
-
-    reply = (
-        f"{supportive} "
-        f"{mindfulness} "
-        f"Tip: {tip} "
-        f"Journaling prompt: {journaling}"
+    return json_response(chatbox_reply(req))
+
+
+@app.post("/chat/mood/stream")
+async def chat_mood_stream(req: MoodRequest, request: Request):
+    return StreamingResponse(
+        stream_mood_reply(request, req.mood),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
     )
-    return {"reply": reply}
 
 
-@app.post("/health/report")
-async def analyze_report(file: UploadFile = File(...)):
-    raw = await file.read()
-    text = extract_text_from_upload(file, raw)
-
-    if not text.strip():
-        summary = (
-            "I could not read the contents of this file. It may be an image or a "
-            "format that this demo does not fully support."
-        )
-        findings: List[str] = []
-    else:
-        preview = text[:1500]
-        lines = [ln.strip() for ln in preview.splitlines() if ln.strip()]
-        preview_part = " ".join(lines[:3]) + (" ..." if len(lines) > 3 else "")
+@app.post("/chatbox/stream")
+async def chatbox_stream(req: ChatboxRequest, request: Request):
+    session_id, session = load_session(req.session_id)
+    detected_mood, matched_keywords = detect_mood(req.message or "")
+    detected_mood = mood_with_context(session, detected_mood, matched_keywords)
+    logger.debug("chatbox mood=%s keywords=%s", detected_mood, matched_keywords)
+    session.add_mood(MOOD_IDS[detected_mood], SESSION_RECENT_MOODS)
+    return StreamingResponse(
+        stream_mood_reply(request, detected_mood, (session_id, session)),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "X-Session-Id": session_id},
+    )
 
-        findings = analyze_report_text(text)
 
-        summary_lines = ["Key points I can see in the text (non-medical):"]
-        if findings:
-            for f in findings:
-                summary_lines.append(f"- " + f)
-        else:
-            summary_lines.append("- No obvious abnormal values detected by this simple checker.")
-
-        summary_lines.append("")
-        summary_lines.append("Short preview from the report:")
-        summary_lines.append(preview_part)
-
-        summary = "\n".join(summary_lines)
-
-    general_guidance = [
-        "I am not a doctor and cannot provide a diagnosis or prescribe medicines.",
-        "Please discuss this report with a qualified healthcare professional for accurate interpretation.",
-        "If you have serious symptoms like chest pain, trouble breathing, severe pain, or confusion, seek emergency medical help immediately.",
-        "In general, follow your doctor's instructions, take medicines only as prescribed, rest adequately, stay hydrated, and maintain a balanced diet.",
-        "For borderline blood pressure or cholesterol, lifestyle changes such as regular physical activity, balanced diet, stress management, and avoiding smoking are often recommended — but your doctor is the best person to guide you.",
-    ]
-
-    return {
-        "file_name": file.filename,
-        "summary": summary,
-        "general_advice": general_guidance,
-    }
+@app.post("/chat/mood/classify")
+def chat_mood_classify(req: MoodClassifyRequest):
+    """
+    Per-mood scores from the n-gram classifier for a batch of messages,
+    whichever engine /chatbox is configured with.
+    """
+    if len(req.messages) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(req.messages)} messages; the maximum is {BATCH_MAX_ITEMS}.",
+        )
+    classifier = get_mood_classifier()
+    return json_response({
+        "backend": classifier.backend,
+        "results": classifier.classify_batch(req.messages),
+    })
+
+
+@app.post("/chat/mood/batch")
+def chat_mood_batch(items: List[Any] = Body(...)):
+    return json_response(run_batch(items, MoodRequest, lambda req: {"reply": build_mood_reply(req.mood)}))
+
+
+@app.post("/chatbox/batch")
+def chatbox_batch(items: List[Any] = Body(...)):
+    return json_response(run_batch(items, ChatboxRequest, chatbox_reply))
+
+
+@app.post("/fitness/plan/batch")
+def fitness_plan_batch(items: List[Any] = Body(...)):
+    return json_response(run_batch(
+        items,
+        FitnessRequest,
+        lambda req: {
+            "goal": req.goal,
+            "activity_level": req.activity_level,
+            "age_group": req.age_group,
+            "plan": select_fitness_plan(req.goal, req.activity_level, req.age_group),
+            "tips": FITNESS_TIPS,
+        },
+    ))
+
+
+@app.get("/health/report/history")
+def report_history(
+    request: Request,
+    analyte: Optional[str] = None,
+    last: int = 10,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+):
+    """
+    Trend of the caller's (X-User-Id) lab values: per analyte the count,
+    min, max and latest value in [since, until], and the last `last` points.
+    """
+    if lab_history is None:
+        raise HTTPException(status_code=404, detail="Lab history is not enabled.")
+    user_id = report_user_id(request)
+    if user_id is None:
+        raise HTTPException(status_code=400, detail="Send X-User-Id to read a lab history.")
+    if analyte is not None and analyte not in LAB_TARGETS:
+        raise HTTPException(status_code=400, detail=f"Unknown analyte {analyte!r}.")
+    last = min(max(last, 0), LAB_HISTORY_MAX_POINTS)
+    return json_response({
+        "user_id": user_id,
+        "analytes": lab_history.trend(user_id, analyte, last, since, until),
+    })
+
+
+@app.get("/health/report/jobs/{job_id}")
+async def report_job_status(job_id: str, wait: float = 0.0):
+    job = await wait_for_report_job(job_id, min(max(wait, 0.0), REPORT_JOB_MAX_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found or expired.")
+    return json_response(report_job_response(job))
+
 
+@app.post("/health/report")
+async def analyze_report(request: Request, file: UploadFile = File(...)):
+    user_id = report_user_id(request)
+    if wants_async_report(request):
+        job = await submit_report_job(file, user_id)
+        status_url = f"/health/report/jobs/{job['job_id']}"
+        return json_response({**job, "status_url": status_url}, status_code=202, headers={"Location": status_url})
+
+    with stage_timer("read"):
+        payload = await read_upload_limited(file)
+    cache_key = report_cache_key(file.filename, payload.sha256)
+    try:
+        # a cached result needs no worker, so only misses wait for admission
+        result = report_cache.get(cache_key)
+        if result is None:
+            async with admit_report(request):
+                result = await run_report_job(file.filename, payload.source, "report")
+            if not result.get("partial"):
+                report_cache.put(cache_key, result)
+    finally:
+        payload.close()
+    record_lab_history(user_id, payload.sha256, time.time(), result)
+    logger.info(
+        "report intake file=%s size=%d peak_bytes=%d",
+        file.filename, payload.size, payload.peak_bytes,
+    )
+    return json_response(
+        report_response_body(file.filename, result),
+        headers={"X-Upload-Peak-Bytes": str(payload.peak_bytes)},
+    )
 
 
+limit_upload_route("/health/report", REPORT_MAX_UPLOAD_BYTES + REPORT_MULTIPART_OVERHEAD_BYTES)
@@ -0,0 +1,234 @@
+"""
+Small in-process metrics registry with Prometheus text exposition, plus an
+ASGI middleware recording per-route request counts, latency, in-flight
+requests and payload sizes. No client library needed; each observation is
+a dict lookup and a few additions under a lock.
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+import time
+
+from starlette.routing import Match
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra="") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = self.header()
+        if not self.labels and not self._values:
+            lines.append(f"{self.name} 0")
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_label_str(self.labels, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # per-bucket (non-cumulative) counts, sum, count
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][idx] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = self.header()
+        for labels, (counts, total, count) in sorted(self._values.items()):
+            running = 0
+            for bound, n in zip(self.buckets, counts):
+                running += n
+                le = _label_str(self.labels, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{le} {running}")
+            le = _label_str(self.labels, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests handled.", ("method", "route", "status")))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route")))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.", ("route",)))
+HTTP_REQUEST_SIZE = REGISTRY.register(Histogram(
+    "http_request_size_bytes", "Declared request body size.", ("route",), SIZE_BUCKETS))
+HTTP_RESPONSE_SIZE = REGISTRY.register(Histogram(
+    "http_response_size_bytes", "Response body size.", ("route",), SIZE_BUCKETS))
+REPORT_STAGE_LATENCY = REGISTRY.register(Histogram(
+    "report_stage_duration_seconds", "Time spent in each /health/report stage.", ("stage",)))
+REPORT_PDF_PAGE_FAILURES = REGISTRY.register(Counter(
+    "report_pdf_page_failures_total", "PDF pages whose text extraction raised and was skipped."))
+REPORT_ADMISSION_WAIT = REGISTRY.register(Histogram(
+    "report_admission_wait_seconds", "Time a report upload waited for admission."))
+REPORT_ADMISSION_REJECTIONS = REGISTRY.register(Counter(
+    "report_admission_rejections_total", "Report uploads turned away by admission control.", ("reason",)))
+REPORT_ADMISSION_ACTIVE = REGISTRY.register(Gauge(
+    "report_admission_active", "Report uploads currently admitted."))
+REPORT_ADMISSION_QUEUED = REGISTRY.register(Gauge(
+    "report_admission_queued", "Report uploads waiting for admission."))
+MOOD_CLASSIFIER_OVER_BUDGET = REGISTRY.register(Counter(
+    "mood_classifier_over_budget_total", "Mood classifications slower than MOOD_CLASSIFIER_BUDGET_MS."))
+REPORT_JOBS_FINISHED = REGISTRY.register(Counter(
+    "report_jobs_finished_total", "Async report jobs finished, by outcome.", ("status",)))
+REPORT_POOL_RESTARTS = REGISTRY.register(Counter(
+    "report_pool_restarts_total", "Report pools rebuilt after a worker process died."))
+REPORT_BUDGET_EXHAUSTED = REGISTRY.register(Counter(
+    "report_budget_exhausted_total", "Reports cut short by their route's time budget.", ("route",)))
+
+
+@contextmanager
+def stage_timer(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REPORT_STAGE_LATENCY.observe(time.perf_counter() - start, stage)
+
+
+def record_report_stats(stats: dict) -> None:
+    """Fold the timings a report worker process sent back into this process's metrics."""
+    for stage, seconds in stats.get("stages", {}).items():
+        REPORT_STAGE_LATENCY.observe(seconds, stage)
+    failures = stats.get("pdf_page_failures", 0)
+    if failures:
+        REPORT_PDF_PAGE_FAILURES.inc(amount=failures)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no per-request task or body buffering, so it is
+    safe for streamed responses). Unknown paths share the "other" label to
+    keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._static = None
+        self._templated = None
+
+    def _route_label(self, scope) -> str:
+        """The matched route's path template, e.g. /health/report/jobs/{job_id}."""
+        if self._static is None:
+            router = scope.get("app")
+            routes = [r for r in getattr(getattr(router, "router", None), "routes", None) or [] if hasattr(r, "path")]
+            self._static = {r.path for r in routes if "{" not in r.path}
+            # matched the way the router matches them, but only for paths that are not a static route
+            self._templated = [r for r in routes if "{" in r.path]
+        path = scope.get("path", "")
+        if path in self._static:
+            return path
+        for route in self._templated:
+            if route.matches(scope)[0] != Match.NONE:
+                return route.path
+        return "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route_label(scope)
+        method = scope.get("method", "")
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length":
+                if value.isdigit():
+                    HTTP_REQUEST_SIZE.observe(int(value), route)
+                break
+
+        status = 500
+        sent = 0
+
+        async def send_wrapper(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec(route)
+            HTTP_LATENCY.observe(time.perf_counter() - start, method, route)
+            HTTP_REQUESTS.inc(method, route, str(status))
+            HTTP_RESPONSE_SIZE.observe(sent, route)
@@ -0,0 +1,201 @@
+"""
+Hashed n-gram mood classifier, an alternative to the keyword matcher.
+
+A message is tokenized, words in the scope of a negation ("not", "never",
+"don't", ...) are marked ("not happy" -> "not_happy"), and the marked
+unigrams plus the raw bigrams are hashed into 2**20 buckets. Each bucket
+maps to a row of a small weight matrix, built once from a lexicon, and
+logits = bias + sum of the matched rows. A softmax turns the logits into
+per-mood scores.
+
+With NumPy installed, batches of at least NUMPY_MIN_BATCH messages are
+summed with a single gather-and-scatter; NumPy is imported on the first
+such batch. Without NumPy, and for smaller batches, the same sums run in
+pure Python with identical results. Work per message is capped at
+`max_tokens`, which keeps the per-message latency bounded.
+"""
+
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import Dict, List, Sequence
+import math
+import os
+import re
+import zlib
+
+BUCKET_BITS = 20
+# below this many messages the per-call NumPy overhead outweighs the vectorized sums
+NUMPY_MIN_BATCH = int(os.getenv("MOOD_CLASSIFIER_NUMPY_MIN_BATCH", "32"))
+NEGATORS = frozenset(["not", "no", "never", "nothing", "without", "hardly", "cannot", "nor"])
+# words after a negator that stay negated, unless punctuation ends the clause first
+NEGATION_SCOPE = 3
+
+_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?|[.!?,;:]")
+
+# words the keyword table misses, by mood
+EXTRA_LEXICON = {
+    "stressed": ["stressful", "stressing", "deadline", "deadlines", "tense"],
+    "anxious": ["worried", "worry", "worrying", "nervous", "scared", "afraid", "panicking"],
+    "sad": ["unhappy", "cry", "crying", "miserable", "hopeless", "heartbroken"],
+    "angry": ["annoyed", "frustrated", "irritated", "rage", "hate"],
+    "lonely": ["isolated", "nobody", "left out"],
+    "tired": ["sleepy", "drained", "worn out", "no energy"],
+    "overwhelmed": ["swamped", "drowning", "can't cope"],
+    "unmotivated": ["procrastinating", "can't focus", "pointless"],
+    "happy": ["great", "glad", "grateful", "joy", "wonderful", "amazing"],
+}
+# words that signal a mood only when negated ("no motivation", "can't sleep")
+NEGATED_LEXICON = {
+    "unmotivated": ["motivated", "motivation", "interest"],
+    "tired": ["energy", "sleep", "rest"],
+    "lonely": ["friends", "anyone"],
+}
+# a negated mood word points to this mood instead ("not happy" reads as sad);
+# other negated mood words lean to neutral, at half weight so that any other
+# mood word in the message still wins
+NEGATED_MOOD = {"happy": "sad", "unmotivated": "happy"}
+HIT_WEIGHT = 2.0
+NEUTRAL_BIAS = 1.0
+
+
+def tokenize(message: str, max_tokens: int) -> List[str]:
+    return _TOKEN_RE.findall((message or "").lower().replace("’", "'")[: max_tokens * 12])[:max_tokens]
+
+
+def mark_negation(tokens: List[str]) -> List[str]:
+    marked = []
+    scope = 0
+    for token in tokens:
+        if not token[0].isalpha():
+            scope = 0
+            marked.append(token)
+        elif token in NEGATORS or token.endswith("n't"):
+            scope = NEGATION_SCOPE
+            marked.append(token)
+        elif scope:
+            scope -= 1
+            marked.append("not_" + token)
+        else:
+            marked.append(token)
+    return marked
+
+
+def features(message: str, max_tokens: int) -> List[str]:
+    tokens = tokenize(message, max_tokens)
+    words = [t for t in tokens if t[0].isalpha()]
+    return mark_negation(tokens) + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+@lru_cache(maxsize=1 << 16)
+def bucket(feature: str) -> int:
+    # crc32 rather than hash(): the table must not change between processes
+    return zlib.crc32(feature.encode("utf-8")) & ((1 << BUCKET_BITS) - 1)
+
+
+@lru_cache(maxsize=None)
+def _numpy():
+    # imported on the first batch big enough to use it: the import alone takes
+    # about 100ms, which every process start would otherwise pay
+    try:
+        import numpy
+    except ImportError:  # optional; the pure-Python path gives the same scores
+        return None
+    return numpy
+
+
+def build_lexicon(keywords: Dict[str, Sequence[str]]) -> Dict[str, Dict[str, float]]:
+    """feature -> {mood: weight}, from the keyword table plus the lexicons above."""
+    lexicon: Dict[str, Dict[str, float]] = {}
+    for source in (keywords, EXTRA_LEXICON):
+        for mood, words in source.items():
+            for word in words:
+                lexicon.setdefault(word, {})[mood] = HIT_WEIGHT
+                if " " not in word:
+                    negated = lexicon.setdefault("not_" + word, {})
+                    negated[mood] = -HIT_WEIGHT
+                    if mood in NEGATED_MOOD:
+                        negated[NEGATED_MOOD[mood]] = HIT_WEIGHT
+                    else:
+                        negated["neutral"] = HIT_WEIGHT / 2
+    for mood, words in NEGATED_LEXICON.items():
+        for word in words:
+            lexicon.setdefault("not_" + word, {})[mood] = HIT_WEIGHT
+    return lexicon
+
+
+class MoodClassifier:
+    def __init__(
+        self,
+        lexicon: Dict[str, Dict[str, float]],
+        moods: Sequence[str],
+        default: str = "neutral",
+        max_tokens: int = 256,
+    ):
+        self.moods = list(moods)
+        self.default = default
+        self.max_tokens = max_tokens
+        self.backend = "numpy" if find_spec("numpy") is not None else "python"
+        column = {mood: j for j, mood in enumerate(self.moods)}
+        # row 0 is the all-zero row for buckets no lexicon feature hashes to
+        self.feature_names = [""] + list(lexicon)
+        rows = [[0.0] * len(self.moods)]
+        for weights in lexicon.values():
+            row = [0.0] * len(self.moods)
+            for mood, weight in weights.items():
+                row[column[mood]] = weight
+            rows.append(row)
+        self.bias = [NEUTRAL_BIAS if mood == default else 0.0 for mood in self.moods]
+        # bucket -> weight row; a dict, since only a few hundred of the 2**20 buckets are used
+        self._row_of = {bucket(name): i for i, name in enumerate(self.feature_names) if i}
+        self._weights = rows
+        self._np_weights = None
+
+    def _matched_rows(self, message: str) -> List[int]:
+        row_of = self._row_of
+        return [row_of[b] for b in map(bucket, features(message, self.max_tokens)) if b in row_of]
+
+    def _logits(self, matched: List[List[int]]):
+        np = _numpy() if len(matched) >= NUMPY_MIN_BATCH else None
+        if np is None:
+            weights = self._weights
+            out = []
+            for rows in matched:
+                logits = list(self.bias)
+                for i in rows:
+                    for j, weight in enumerate(weights[i]):
+                        logits[j] += weight
+                out.append(logits)
+            return out
+        if self._np_weights is None:
+            self._np_weights = np.asarray(self._weights, dtype=np.float64)
+            self._bias = np.asarray(self.bias, dtype=np.float64)
+        owner = np.repeat(np.arange(len(matched)), [len(rows) for rows in matched])
+        rows = np.fromiter((i for r in matched for i in r), dtype=np.intp, count=len(owner))
+        logits = np.tile(self._bias, (len(matched), 1))
+        np.add.at(logits, owner, self._np_weights[rows])
+        return logits.tolist()
+
+    def classify_batch(self, messages: Sequence[str], explain: bool = False) -> List[dict]:
+        """
+        Per message: top mood, its confidence and the softmax score of every
+        mood; with `explain`, also the lexicon features that back the top mood.
+        """
+        matched = [self._matched_rows(message) for message in messages]
+        results = []
+        for rows, logits in zip(matched, self._logits(matched)):
+            top = max(logits)
+            exp = [math.exp(x - top) for x in logits]
+            total = sum(exp)
+            j = logits.index(top)
+            result = {
+                "mood": self.moods[j],
+                "confidence": round(exp[j] / total, 4),
+                "scores": {mood: round(e / total, 4) for mood, e in zip(self.moods, exp)},
+            }
+            if explain:
+                result["matched"] = [self.feature_names[i] for i in rows if self._weights[i][j] > 0]
+            results.append(result)
+        return results
+
+    def classify(self, message: str, explain: bool = False) -> dict:
+        return self.classify_batch([message], explain)[0]
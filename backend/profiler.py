@@ -0,0 +1,224 @@
+"""
+On-demand sampling profiler for live requests.
+
+A request is profiled when it carries the admin header with the configured
+token, or when it is picked by the sampling rate. While it runs, a sampler
+thread reads the stack of the event loop thread every few milliseconds. Sync
+endpoints run on the threadpool, where the event loop only shows an idle
+selector, so they are wrapped in profile_sync_call(), which samples the
+threadpool thread running them. Report jobs sent to the worker pool are
+wrapped in profile_call(), which samples the thread doing the parsing in the
+worker. All stacks are folded
+into one file in the collapsed format ("frame;frame;frame count" per line)
+that flamegraph.pl, speedscope and inferno read directly. The profile
+directory is trimmed to a file-count and byte budget after every write.
+
+With no token and a zero rate, the middleware is a single attribute check
+per request.
+"""
+
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+import functools
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# the Profile of the request being handled, if it is being profiled
+current_profile: ContextVar[Optional["Profile"]] = ContextVar("current_profile", default=None)
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})".replace(";", ",")
+
+
+class StackSampler:
+    """
+    Samples one thread's stack from a daemon thread until stopped. Frames
+    from `base` outward (e.g. a forked worker's inherited stack) are left out.
+    """
+
+    def __init__(self, thread_id: int, interval: float, root: str, base=None):
+        self.thread_id = thread_id
+        self.base = base
+        self.interval = interval
+        self.root = root
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        labels = {}
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and frame is not self.base:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                names.append(label)
+                frame = frame.f_back
+            names.append(self.root)
+            self.stacks[";".join(reversed(names))] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+def profile_call(interval: float, fn, *args):
+    """Run fn(*args) while sampling this thread; returns (result, folded stacks)."""
+    sampler = StackSampler(threading.get_ident(), interval, f"worker-{os.getpid()}", sys._getframe()).start()
+    try:
+        result = fn(*args)
+    finally:
+        stacks = sampler.stop()
+    return result, dict(stacks)
+
+
+def profile_sync_call(fn):
+    """
+    Wrap a sync function so that, while the current request is profiled, the
+    thread running it (a threadpool thread for sync endpoints) is sampled into
+    the request's profile. Otherwise it costs one context variable lookup.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return fn(*args, **kwargs)
+        sampler = StackSampler(threading.get_ident(), profile.interval, "threadpool", sys._getframe()).start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.add(sampler.stop())
+
+    return wrapper
+
+
+class Profile:
+    def __init__(self, profile_id: str, interval: float):
+        self.id = profile_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+
+    def add(self, stacks: dict) -> None:
+        self.stacks.update(stacks)
+
+
+class ProfileStore:
+    """Writes folded profiles to a directory capped by file count and bytes."""
+
+    def __init__(self, directory: str, max_files: int = 50, max_bytes: int = 20 * 1024 * 1024):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def save(self, name: str, stacks: Counter) -> Optional[str]:
+        if not stacks:
+            return None
+        body = "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items())).encode("utf-8")
+        if len(body) > self.max_bytes:
+            logger.warning("profile %s is %d bytes, over the %d byte budget; dropped", name, len(body), self.max_bytes)
+            return None
+        path = os.path.join(self.directory, name + ".folded")
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "wb") as fh:
+                fh.write(body)
+            self._trim()
+        return path
+
+    def _trim(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".folded") and entry.is_file():
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_files or total > self.max_bytes):
+            _, size, path = entries.pop(0)
+            total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware. Profiles a request that sends `header` with the
+    admin token, or that is picked with probability `sample_rate`, and
+    returns the profile's file name in an X-Profile-Id response header.
+    """
+
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        token: Optional[str] = None,
+        sample_rate: float = 0.0,
+        interval: float = 0.005,
+        header: str = "x-profile-token",
+    ):
+        self.app = app
+        self.store = store
+        self.token = token.encode("utf-8") if token else None
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.header = header.encode("latin-1")
+        self.enabled = bool(self.token) or sample_rate > 0
+
+    def _wanted(self, scope) -> bool:
+        if self.token is not None:
+            for name, value in scope.get("headers", ()):
+                if name == self.header:
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        route = re.sub(r"[^A-Za-z0-9]+", "_", scope.get("path", "")).strip("_") or "root"
+        profile = Profile(f"{time.strftime('%Y%m%dT%H%M%S')}-{route}-{uuid.uuid4().hex[:8]}", self.interval)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile.id.encode("latin-1")),
+                ])
+            await send(message)
+
+        token = current_profile.set(profile)
+        sampler = StackSampler(threading.get_ident(), self.interval, "event-loop").start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.add(sampler.stop())
+            current_profile.reset(token)
+            path = self.store.save(profile.id, profile.stacks)
+            if path:
+                logger.info("saved request profile %s", path)
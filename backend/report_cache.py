@@ -0,0 +1,105 @@
+"""
+Content-addressed cache for report analysis results.
+
+Entries are keyed by a hash of the uploaded bytes (plus the analyzer version),
+kept in an in-process LRU bounded by entry count and bytes, and optionally
+backed by a SharedCache file that every worker process on the host reads and
+writes, so a report analyzed by one worker is a hit in the others and
+survives restarts.
+"""
+
+from collections import OrderedDict
+from typing import Optional
+import json
+import threading
+import time
+
+from shared_cache import SharedCache
+
+
+class ReportCache:
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 16 * 1024 * 1024,
+        ttl_seconds: float = 3600.0,
+        shared: Optional[SharedCache] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (created_at, encoded value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._shared = shared
+
+    def _expired(self, created_at: float) -> bool:
+        return time.time() - created_at > self.ttl_seconds
+
+    def _store(self, key: str, created_at: float, encoded: bytes) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old[1])
+        if len(encoded) > self.max_bytes:
+            return
+        self._entries[key] = (created_at, encoded)
+        self._bytes += len(encoded)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, dropped) = self._entries.popitem(last=False)
+            self._bytes -= len(dropped)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[0]):
+                self._bytes -= len(entry[1])
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry[1])
+        # the shared file is read outside the lock; it has its own
+        shared = self._shared.get(key) if self._shared is not None else None
+        with self._lock:
+            if shared is None:
+                self.misses += 1
+                return None
+            # keeps the shared entry's age, so the local copy expires with it
+            encoded, created_at = shared
+            self._store(key, created_at, encoded)
+            self.shared_hits += 1
+        return json.loads(encoded)
+
+    def put(self, key: str, value: dict) -> None:
+        encoded = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        created_at = time.time()
+        with self._lock:
+            self._store(key, created_at, encoded)
+        if self._shared is not None:
+            self._shared.put(key, encoded)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.hits + self.shared_hits
+            total = hits + self.misses
+            stats = {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "persistent": self._shared is not None,
+            }
+        if self._shared is not None:
+            stats["shared"] = self._shared.stats()
+        return stats
+
+    def close(self) -> None:
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
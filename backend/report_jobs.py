@@ -0,0 +1,181 @@
+"""
+SQLite-backed queue for asynchronous report analysis.
+
+An upload is stored as a queued job together with its bytes. Runners claim
+jobs one at a time, and a claim is a lease: a job whose runner died (or whose
+process restarted) before finishing is handed out again once the lease
+expires. Finished jobs keep their result, without the upload bytes, until the
+TTL runs out.
+"""
+
+from typing import Optional
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class ReportJobStore:
+    def __init__(self, path: str, ttl_seconds: float = 3600.0, lease_seconds: float = 300.0, max_attempts: int = 3):
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # The queue holds raw uploads: keep the file owner-only. SQLite gives
+        # the -wal and -shm files it creates the same permissions.
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        os.chmod(path, 0o600)
+        self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS report_jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, file_name TEXT NOT NULL, "
+            "sha256 TEXT NOT NULL, payload BLOB, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, claimed_at REAL, finished_at REAL, user_id TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS report_jobs_status ON report_jobs (status, created_at)")
+
+    def create(
+        self,
+        file_name: str,
+        sha256: str,
+        payload: bytes,
+        result: Optional[dict] = None,
+        user_id: Optional[str] = None,
+    ) -> str:
+        """Queue a job; with a result (e.g. a cache hit) it is stored as already done."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            if result is None:
+                self._db.execute(
+                    "INSERT INTO report_jobs (id, status, file_name, sha256, payload, created_at, user_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, QUEUED, file_name, sha256, payload, now, user_id),
+                )
+            else:
+                self._db.execute(
+                    "INSERT INTO report_jobs (id, status, file_name, sha256, result, created_at, finished_at, user_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, DONE, file_name, sha256, json.dumps(result, ensure_ascii=False), now, now, user_id),
+                )
+        return job_id
+
+    def claim(self) -> Optional[dict]:
+        """Lease the oldest runnable job, or return None when there is nothing to do."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, file_name, sha256, payload, attempts, created_at, user_id FROM report_jobs "
+                    "WHERE status = ? OR (status = ? AND claimed_at < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (QUEUED, RUNNING, now - self.lease_seconds),
+                ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                job_id, file_name, sha256, payload, attempts, created_at, user_id = row
+                if attempts >= self.max_attempts:
+                    # it keeps taking its runner down with it; stop retrying
+                    self._db.execute(
+                        "UPDATE report_jobs SET status = ?, error = ?, payload = NULL, finished_at = ? WHERE id = ?",
+                        (FAILED, "gave up after repeated attempts", now, job_id),
+                    )
+                    self._db.execute("COMMIT")
+                    return None
+                self._db.execute(
+                    "UPDATE report_jobs SET status = ?, claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    (RUNNING, now, job_id),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return {
+            "id": job_id,
+            "file_name": file_name,
+            "sha256": sha256,
+            "payload": bytes(payload),
+            "created_at": created_at,
+            "user_id": user_id,
+        }
+
+    def finish(self, job_id: str, result: dict) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE report_jobs SET status = ?, result = ?, payload = NULL, finished_at = ? WHERE id = ?",
+                (DONE, json.dumps(result, ensure_ascii=False), time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE report_jobs SET status = ?, error = ?, payload = NULL, finished_at = ? WHERE id = ?",
+                (FAILED, error, time.time(), job_id),
+            )
+
+    def release(self, job_ids) -> None:
+        """Put jobs this process had claimed back in the queue (used on shutdown)."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE report_jobs SET status = ?, claimed_at = NULL, attempts = attempts - 1 "
+                "WHERE id = ? AND status = ?",
+                [(QUEUED, job_id, RUNNING) for job_id in job_ids],
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, file_name, result, error, created_at, finished_at FROM report_jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        status, file_name, result, error, created_at, finished_at = row
+        if finished_at is not None and time.time() - finished_at > self.ttl_seconds:
+            return None
+        return {
+            "job_id": job_id,
+            "status": status,
+            "file_name": file_name,
+            "created_at": created_at,
+            "finished_at": finished_at,
+            "result": json.loads(result) if result is not None else None,
+            "error": error,
+        }
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM report_jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (time.time() - self.ttl_seconds,),
+            )
+        return cursor.rowcount
+
+    def pending(self) -> int:
+        with self._lock:
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM report_jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchone()
+        return count
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM report_jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update(rows)
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,566 @@
+"""
+Report text extraction and lab value analysis, shared by POST /health/report
+(main.py) and the offline bulk_analyze.py CLI.
+
+Everything here is plain functions on bytes, mmaps or file paths with no web
+framework involved, so the report worker processes and the CLI import it
+without the app. process_report() and extract_pdf_pages() are the worker
+entry points; scheduling them on a pool is the caller's job.
+"""
+
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+import io
+import logging
+import mmap
+import os
+import re
+import time
+import zipfile
+
+import startup
+from deadlines import ReportDeadlineExceeded, check_deadline, deadline_alarm
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever extraction or analysis rules change so cached results are not reused.
+ANALYZER_VERSION = "4"
+
+
+# ================ REPORT TEXT EXTRACTION ====================
+
+class _MmapReader(io.RawIOBase):
+    """Read-only file view over an mmap without copying it (zipfile wants seekable())."""
+
+    def __init__(self, mapped: mmap.mmap):
+        self._mapped = mapped
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._mapped)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        chunk = self._mapped[self._pos:self._pos + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+
+def _as_stream(raw):
+    # mmap already behaves like a file for pypdf; wrapping it would copy the body
+    if isinstance(raw, mmap.mmap):
+        raw.seek(0)
+        return raw
+    return io.BytesIO(raw)
+
+
+def _as_seekable_stream(raw):
+    """Like _as_stream, for zipfile (DOCX), which needs seekable() and mmap lacks it."""
+    return _MmapReader(raw) if isinstance(raw, mmap.mmap) else io.BytesIO(raw)
+
+
+# Also read paragraphs inside body-level tables (lab results are often tabular).
+# Off by default: python-docx's doc.paragraphs, the original extractor, skips them.
+REPORT_DOCX_TABLES = os.getenv("REPORT_DOCX_TABLES", "0") == "1"
+# Set to 0 to always build the full python-docx Document.
+REPORT_DOCX_FAST_PATH = os.getenv("REPORT_DOCX_FAST_PATH", "1") != "0"
+
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_DOCX_MAIN_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"
+_DOCX_OFFICE_DOCUMENT_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+_DOCX_TABLE_TAGS = frozenset(["tbl", "tr", "tc"])
+# run children python-docx turns into text (w:t and w:br are handled separately)
+_DOCX_RUN_TEXT = {"tab": "\t", "ptab": "\t", "cr": "\n", "noBreakHyphen": "-"}
+
+
+class _DocxFastPathUnsupported(Exception):
+    pass
+
+
+def _docx_main_part(zf: zipfile.ZipFile, etree) -> str:
+    """Zip member of the main document part, checked the way python-docx checks it."""
+    rels = etree.fromstring(zf.read("_rels/.rels"))
+    targets = [r.get("Target") for r in rels if r.get("Type") == _DOCX_OFFICE_DOCUMENT_REL]
+    if len(targets) != 1:
+        raise _DocxFastPathUnsupported("no single officeDocument relationship")
+    part = targets[0].lstrip("/")
+    types = etree.fromstring(zf.read("[Content_Types].xml"))
+    for override in types:
+        if override.get("PartName", "").lstrip("/") == part:
+            if override.get("ContentType") != _DOCX_MAIN_CONTENT_TYPE:
+                raise _DocxFastPathUnsupported("main part is not a Word document")
+            return part
+    raise _DocxFastPathUnsupported("main part has no content type override")
+
+
+def _docx_paragraph_texts(stream, etree, tables: bool) -> List[str]:
+    """
+    Stream the main document part and return the stripped text of each body
+    paragraph, built the way python-docx's Paragraph.text is: the text of
+    w:r and w:hyperlink/w:r children only. Each body-level element is cleared
+    once it has been read.
+    """
+    w = "{%s}" % _W_NS
+    stack: List[Optional[str]] = []
+    texts: List[str] = []
+    para: Optional[List[str]] = None
+    para_depth = run_depth = -1
+    for event, el in etree.iterparse(stream, events=("start", "end")):
+        tag = el.tag
+        name = tag[len(w):] if isinstance(tag, str) and tag.startswith(w) else None
+        if event == "start":
+            depth = len(stack)
+            if depth == 0 and name != "document":
+                raise _DocxFastPathUnsupported(f"unexpected root element {tag}")
+            if name == "p" and para is None and depth >= 2 and stack[1] == "body":
+                if depth == 2 or (tables and all(n in _DOCX_TABLE_TAGS for n in stack[2:])):
+                    para = []
+                    para_depth = depth
+            elif name == "r" and para is not None and (
+                depth == para_depth + 1 or (depth == para_depth + 2 and stack[-1] == "hyperlink")
+            ):
+                run_depth = depth
+            stack.append(name)
+            continue
+
+        stack.pop()
+        depth = len(stack)
+        if run_depth >= 0 and depth == run_depth + 1:
+            if name == "t":
+                para.append(el.text or "")
+            elif name == "br":
+                para.append("\n" if el.get(w + "type", "textWrapping") == "textWrapping" else "")
+            elif name in _DOCX_RUN_TEXT:
+                para.append(_DOCX_RUN_TEXT[name])
+        elif name == "r" and depth == run_depth:
+            run_depth = -1
+        elif name == "p" and depth == para_depth:
+            text = "".join(para).strip()
+            if text:
+                texts.append(text)
+            para = None
+            para_depth = -1
+        if depth == 2:
+            # done with a body-level element: free it and everything before it
+            el.clear()
+            while el.getprevious() is not None:
+                del el.getparent()[0]
+    return texts
+
+
+def extract_docx_paragraphs_fast(raw, tables: bool = False) -> List[str]:
+    etree = startup.lazy_import("lxml.etree")
+    stream = _as_seekable_stream(raw)
+    with zipfile.ZipFile(stream) as zf:
+        with zf.open(_docx_main_part(zf, etree)) as part:
+            return _docx_paragraph_texts(part, etree, tables)
+
+
+def extract_docx_paragraphs_full(raw, tables: bool = False) -> List[str]:
+    stream = _as_seekable_stream(raw)
+    doc = startup.lazy_import("docx").Document(stream)
+    if not tables:
+        paragraphs = [p.text.strip() for p in doc.paragraphs]
+    else:
+        body = doc.element.body
+        paragraphs = []
+        for p in body.iter("{%s}p" % _W_NS):
+            parent = p.getparent()
+            while parent is not body and parent.tag[len(_W_NS) + 2:] in _DOCX_TABLE_TAGS:
+                parent = parent.getparent()
+            if parent is body:
+                paragraphs.append(p.text.strip())
+    return [text for text in paragraphs if text]
+
+
+def extract_text_from_docx_bytes(raw: bytes) -> str:
+    if REPORT_DOCX_FAST_PATH:
+        try:
+            return "\n".join(extract_docx_paragraphs_fast(raw, REPORT_DOCX_TABLES))
+        except ReportDeadlineExceeded:
+            raise
+        except Exception as e:
+            # anything unusual goes to python-docx, which also raises the usual errors for broken files
+            logger.debug("docx fast path fell back to python-docx: %r", e)
+    return "\n".join(extract_docx_paragraphs_full(raw, REPORT_DOCX_TABLES))
+
+
+# Pages read from a PDF at most (the rest of a long report is ignored).
+REPORT_PDF_MAX_PAGES = int(os.getenv("REPORT_PDF_MAX_PAGES", "5"))
+# Fewest pages handed to one worker task when a PDF is split across the report
+# pool. Every task parses the PDF again, so a PDF this short is read by one task.
+REPORT_PDF_PAGES_PER_TASK = int(os.getenv("REPORT_PDF_PAGES_PER_TASK", "8"))
+# Stop reading pages once every analyte in REPORT_PDF_EARLY_EXIT_TARGETS has been seen.
+REPORT_PDF_EARLY_EXIT = os.getenv("REPORT_PDF_EARLY_EXIT", "1") != "0"
+
+
+def _extract_pdf_page(page, stats: Optional[dict]) -> Optional[str]:
+    try:
+        return page.extract_text() or ""
+    except ReportDeadlineExceeded:
+        raise
+    except Exception:
+        logger.debug("skipping PDF page that failed to extract", exc_info=True)
+        if stats is not None:
+            stats["pdf_page_failures"] = stats.get("pdf_page_failures", 0) + 1
+        return None
+
+
+def extract_text_from_pdf_bytes(raw: bytes, stats: Optional[dict] = None, deadline: Optional[float] = None) -> str:
+    """Text of the first pages; past `deadline`, only the pages read so far (stats["timed_out"] is set)."""
+    pages_text = []
+    found = set()
+    try:
+        with deadline_alarm(deadline):
+            reader = startup.lazy_import("pypdf").PdfReader(_as_stream(raw))
+            for page in reader.pages[:REPORT_PDF_MAX_PAGES]:
+                check_deadline(deadline)
+                text = _extract_pdf_page(page, stats)
+                if text is None:
+                    continue
+                pages_text.append(text)
+                if REPORT_PDF_EARLY_EXIT:
+                    found.update(r["analyte"] for r in scan_lab_values(text))
+                    if found >= REPORT_PDF_EARLY_EXIT_TARGETS:
+                        break
+    except ReportDeadlineExceeded:
+        if stats is not None:
+            stats["timed_out"] = True
+    return "\n".join(pages_text)
+
+
+def extract_pdf_pages(source, start: int, stop: int, deadline: Optional[float] = None) -> dict:
+    """
+    Worker task: text and lab readings for pages [start, stop) of a PDF.
+    Failed pages are left out, as in extract_text_from_pdf_bytes. Past
+    `deadline` it returns the pages done so far with "timed_out" set
+    (and no page_count if it did not get as far as reading it).
+    """
+    stats = {"pdf_page_failures": 0}
+    pages = []
+    page_count = None
+    timed_out = False
+    try:
+        with deadline_alarm(deadline):
+            with open_report_source(source) as raw:
+                reader = startup.lazy_import("pypdf").PdfReader(_as_stream(raw))
+                page_count = len(reader.pages)
+                for page in reader.pages[start:stop]:
+                    check_deadline(deadline)
+                    text = _extract_pdf_page(page, stats)
+                    if text is not None:
+                        pages.append((text, scan_lab_values(text)))
+    except ReportDeadlineExceeded:
+        timed_out = True
+    return {
+        "pages": pages,
+        "page_count": page_count,
+        "failures": stats["pdf_page_failures"],
+        "timed_out": timed_out,
+    }
+
+
+def extract_text_by_name(
+    name: str, raw: bytes, stats: Optional[dict] = None, deadline: Optional[float] = None
+) -> str:
+    name = (name or "").lower()
+    if name.endswith(".pdf"):
+        return extract_text_from_pdf_bytes(raw, stats, deadline)
+    if name.endswith(".docx"):
+        try:
+            with deadline_alarm(deadline):
+                return extract_text_from_docx_bytes(raw)
+        except ReportDeadlineExceeded:
+            if stats is not None:
+                stats["timed_out"] = True
+            return ""
+    try:
+        return bytes(raw).decode("utf-8", errors="ignore")
+    except Exception:
+        return ""
+
+
+# ================ SIMPLE "AI" REPORT ANALYSIS =================
+
+# Declarative lab marker table. A marker is tied to the first value after it
+# on the same line whose unit is listed; thresholds are in the first unit.
+LAB_RULES = [
+    {
+        "analyte": "total_cholesterol",
+        "aliases": ["total cholesterol", "cholesterol"],
+        "units": ["mg/dl"],
+        "above": 200,
+        "finding": "Total cholesterol is around {value} mg/dL, which is above common reference ranges.",
+    },
+    {
+        "analyte": "ldl",
+        "aliases": ["ldl cholesterol", "ldl-c", "ldl"],
+        "units": ["mg/dl"],
+        "above": 130,
+        "finding": "LDL (often called 'bad' cholesterol) is about {value} mg/dL, which is higher than many guidelines suggest.",
+    },
+    {
+        "analyte": "hdl",
+        "aliases": ["hdl cholesterol", "hdl-c", "hdl"],
+        "units": ["mg/dl"],
+        "below": 40,
+        "finding": "HDL (sometimes called 'good' cholesterol) is around {value} mg/dL, which can be on the lower side.",
+    },
+    {
+        "analyte": "triglycerides",
+        "aliases": ["triglycerides", "triglyceride"],
+        "units": ["mg/dl"],
+        "above": 150,
+        "finding": "Triglycerides are about {value} mg/dL, which is somewhat higher than typical reference values.",
+    },
+    {
+        "analyte": "glucose",
+        "aliases": ["fasting blood sugar", "fasting glucose", "blood glucose", "blood sugar", "glucose"],
+        "units": ["mg/dl"],
+        "above": 99,
+        "finding": "Glucose is about {value} mg/dL, which is above the usual fasting range.",
+    },
+    {
+        "analyte": "hba1c",
+        "aliases": ["glycated hemoglobin", "hemoglobin a1c", "hba1c", "hb a1c", "a1c"],
+        "units": ["%"],
+        "above": 5.6,
+        "finding": "HbA1c is about {value}%, which is above the typical non-diabetic range.",
+    },
+    {
+        "analyte": "tsh",
+        "aliases": ["thyroid stimulating hormone", "tsh"],
+        "units": ["miu/l", "uiu/ml", "µiu/ml", "μiu/ml", "mu/l"],
+        "above": 4.5,
+        "below": 0.4,
+        "finding": "TSH is about {value} mIU/L, which is outside the common reference range.",
+    },
+]
+
+_LAB_RULES_BY_ALIAS = {alias: rule for rule in LAB_RULES for alias in rule["aliases"]}
+# Other measures whose names contain a marker ("non-hdl cholesterol" is neither
+# HDL nor total cholesterol). They are matched like markers, so the scan steps
+# over them, and then ignored.
+_LAB_NOT_MARKERS = [
+    "non-hdl cholesterol", "non hdl cholesterol", "non-hdl-c", "non-hdl", "non hdl",
+    "vldl cholesterol", "vldl-c", "vldl",
+]
+_LAB_UNITS = sorted({u for rule in LAB_RULES for u in rule["units"]} | {"mmhg"}, key=len, reverse=True)
+
+
+def _alternation(words) -> str:
+    # longest first so "ldl cholesterol" wins over "ldl" at the same position
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+# One tokenizer for the whole document. Numbers may only start at the
+# beginning of a digit run and every alternative is a literal or a bounded
+# run, so a failed attempt costs at most the run it started on and the scan
+# stays linear in the text (no nested or overlapping quantifiers).
+_LAB_TOKEN_RE = re.compile(
+    r"(?P<marker>(?<![a-z0-9])(?:" + _alternation(list(_LAB_RULES_BY_ALIAS) + _LAB_NOT_MARKERS) + r"))"
+    r"|(?<![\d.])(?P<sys>\d{2,3})[^\S\n]*/[^\S\n]*(?P<dia>\d{2,3})[^\S\n]*mmhg"
+    r"|(?<![\d.])(?P<number>\d+(?:\.\d+)?)[^\S\n]*(?P<unit>" + _alternation(_LAB_UNITS) + r")"
+    r"|(?P<newline>\n)"
+)
+
+
+def scan_lab_values(text: str) -> List[dict]:
+    """
+    Find every lab reading in one pass over the (lowercased) text.
+    Returns dicts with analyte, value, unit and the offset of the marker,
+    in the order the values appear.
+    """
+    readings = []
+    # unit -> markers on the current line still waiting for a value
+    pending: Dict[str, List[list]] = {}
+
+    for tok in _LAB_TOKEN_RE.finditer(text.lower()):
+        kind = tok.lastgroup
+        if kind == "marker":
+            rule = _LAB_RULES_BY_ALIAS.get(tok.group("marker"))
+            if rule is None:
+                continue
+            entry = [rule, tok.start(), False]
+            for unit in rule["units"]:
+                pending.setdefault(unit, []).append(entry)
+        elif kind == "newline":
+            if pending:
+                pending = {}
+        elif tok.group("sys") is not None:
+            readings.append({
+                "analyte": "blood_pressure",
+                "value": int(tok.group("sys")),
+                "diastolic": int(tok.group("dia")),
+                "unit": "mmhg",
+                "offset": tok.start(),
+            })
+        else:
+            waiting = pending.pop(tok.group("unit"), None)
+            if not waiting:
+                continue
+            value = float(tok.group("number"))
+            if value.is_integer():
+                value = int(value)
+            for entry in waiting:
+                rule, offset, done = entry
+                if done:
+                    continue
+                entry[2] = True
+                readings.append({
+                    "analyte": rule["analyte"],
+                    "value": value,
+                    "unit": tok.group("unit"),
+                    "offset": offset,
+                })
+    return readings
+
+
+def _out_of_range(rule: dict, value) -> bool:
+    if "above" in rule and value > rule["above"]:
+        return True
+    return "below" in rule and value < rule["below"]
+
+
+# every analyte the analyzer reports on; once all are seen, later pages cannot change the findings
+LAB_TARGETS = frozenset(["blood_pressure"] + [rule["analyte"] for rule in LAB_RULES])
+# Comma-separated analytes whose first readings end the PDF early exit; all of
+# LAB_TARGETS by default. A lipid panel never mentions the others, so e.g.
+# "total_cholesterol,ldl,hdl,triglycerides" lets it stop, at the cost of
+# ignoring any other analyte on later pages.
+REPORT_PDF_EARLY_EXIT_TARGETS = frozenset(
+    name.strip() for name in os.getenv("REPORT_PDF_EARLY_EXIT_TARGETS", "").split(",") if name.strip()
+) or LAB_TARGETS
+if not REPORT_PDF_EARLY_EXIT_TARGETS <= LAB_TARGETS:
+    raise RuntimeError(
+        f"REPORT_PDF_EARLY_EXIT_TARGETS has unknown analytes "
+        f"{sorted(REPORT_PDF_EARLY_EXIT_TARGETS - LAB_TARGETS)}; known: {sorted(LAB_TARGETS)}"
+    )
+
+
+def analyze_report_text(text: str) -> List[str]:
+    return findings_from_readings(scan_lab_values(text))
+
+
+def first_readings(readings: List[dict]) -> Dict[str, dict]:
+    """The first reading of each analyte; later mentions of the same analyte are ignored."""
+    first: Dict[str, dict] = {}
+    for reading in readings:
+        first.setdefault(reading["analyte"], reading)
+    return first
+
+
+def findings_from_readings(readings: List[dict]) -> List[str]:
+    findings = []
+    first = first_readings(readings)
+
+    bp = first.get("blood_pressure")
+    if bp:
+        sys, dia = bp["value"], bp["diastolic"]
+        if sys >= 140 or dia >= 90:
+            findings.append(
+                f"Blood pressure appears elevated around {sys}/{dia} mmHg, "
+                "which can be consistent with high blood pressure. Only a doctor can accurately interpret this."
+            )
+
+    for rule in LAB_RULES:
+        reading = first.get(rule["analyte"])
+        if reading and _out_of_range(rule, reading["value"]):
+            findings.append(rule["finding"].format(value=reading["value"]))
+
+    return findings
+
+
+# ================ REPORT PIPELINE ===========================
+
+def build_report_result(text: str, stats: Optional[dict] = None, readings: Optional[List[dict]] = None) -> dict:
+    stages = stats.setdefault("stages", {}) if stats is not None else {}
+    if not text.strip():
+        summary = (
+            "I could not read the contents of this file. It may be an image or a "
+            "format that this demo does not fully support."
+        )
+        findings: List[str] = []
+        readings = []
+    else:
+        preview = text[:1500]
+        lines = [ln.strip() for ln in preview.splitlines() if ln.strip()]
+        preview_part = " ".join(lines[:3]) + (" ..." if len(lines) > 3 else "")
+
+        start = time.perf_counter()
+        if readings is None:
+            readings = scan_lab_values(text)
+        findings = findings_from_readings(readings)
+        stages["analyze"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        summary_lines = ["Key points I can see in the text (non-medical):"]
+        if findings:
+            for f in findings:
+                summary_lines.append(f"- " + f)
+        else:
+            summary_lines.append("- No obvious abnormal values detected by this simple checker.")
+
+        summary_lines.append("")
+        summary_lines.append("Short preview from the report:")
+        summary_lines.append(preview_part)
+
+        summary = "\n".join(summary_lines)
+        stages["summary"] = time.perf_counter() - start
+
+    # the values behind the findings, kept for the user's lab history
+    values = [
+        {k: r[k] for k in ("analyte", "value", "diastolic") if k in r}
+        for r in first_readings(readings).values()
+    ]
+    return {"summary": summary, "findings": findings, "values": values}
+
+
+REPORT_PARTIAL_NOTE = (
+    "This report took too long to read in full, so only the part that could be "
+    "read in time was checked."
+)
+
+
+def mark_report_partial(result: dict) -> None:
+    result["partial"] = True
+    result["summary"] = REPORT_PARTIAL_NOTE + "\n\n" + result["summary"]
+
+
+@contextmanager
+def open_report_source(source):
+    """Yield the upload body for `source`: the bytes themselves, or an mmap of a spooled file."""
+    if isinstance(source, str):
+        with open(source, "rb") as fh:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+    else:
+        yield source
+
+
+def process_report(filename: str, source, deadline: Optional[float] = None) -> Tuple[dict, dict]:
+    """
+    Extract + analyze one upload. `source` is the raw bytes or the path of a
+    spooled upload; this runs inside a worker process, so it must stay picklable.
+    Returns the result and the stage timings / page failure counts, which the
+    caller records since metrics in a worker process would be lost. Extraction
+    stops at `deadline` and whatever was read by then is analyzed
+    (stats["timed_out"] is set).
+    """
+    stats = {"stages": {}, "pdf_page_failures": 0}
+    start = time.perf_counter()
+    with open_report_source(source) as raw:
+        text = extract_text_by_name(filename, raw, stats, deadline)
+    stats["stages"]["extract"] = time.perf_counter() - start
+    return build_report_result(text, stats), stats
@@ -0,0 +1,172 @@
+"""
+Bounded server-side conversation sessions for /chatbox.
+
+A session keeps the ids of its most recent detected moods and of the
+responses it was already served, packed into one small bytes blob. The
+memory backend holds those blobs in an LRU with a TTL, a session-count cap
+and a global byte budget. The SQLite backend stores the same blobs on local
+disk, so several uvicorn workers on one host can share sessions.
+"""
+
+from array import array
+from collections import OrderedDict
+from typing import Optional
+import os
+import sqlite3
+import struct
+import threading
+import time
+
+_HEADER = struct.Struct("<dBB")  # touched_at, number of moods, number of served ids
+# rough per-entry cost of the OrderedDict slot, key and bytes object headers
+ENTRY_OVERHEAD = 160
+
+
+class SessionRecord:
+    __slots__ = ("moods", "served", "touched_at")
+
+    def __init__(self, moods=b"", served=(), touched_at: float = 0.0):
+        self.moods = bytearray(moods)  # mood ids, oldest first
+        self.served = array("H", served)  # response ids, oldest first
+        self.touched_at = touched_at
+
+    def add_mood(self, mood_id: int, keep: int) -> None:
+        self.moods.append(mood_id)
+        if len(self.moods) > keep:
+            del self.moods[: len(self.moods) - keep]
+
+    def mark_served(self, response_id: int, keep: int) -> None:
+        self.served.append(response_id)
+        if len(self.served) > keep:
+            del self.served[: len(self.served) - keep]
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(self.touched_at, len(self.moods), len(self.served)) + bytes(self.moods) + self.served.tobytes()
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "SessionRecord":
+        touched_at, n_moods, n_served = _HEADER.unpack_from(blob)
+        start = _HEADER.size
+        moods = blob[start:start + n_moods]
+        served = array("H")
+        served.frombytes(blob[start + n_moods:start + n_moods + 2 * n_served])
+        return cls(moods, served, touched_at)
+
+
+class MemorySessionBackend:
+    def __init__(self, max_sessions: int = 10000, max_bytes: int = 8 * 1024 * 1024, ttl_seconds: float = 1800.0):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._entries = OrderedDict()  # session id -> packed record
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cost(session_id: str, blob: bytes) -> int:
+        return ENTRY_OVERHEAD + len(session_id) + len(blob)
+
+    def _drop(self, session_id: str) -> None:
+        blob = self._entries.pop(session_id)
+        self._bytes -= self._cost(session_id, blob)
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            blob = self._entries.get(session_id)
+            if blob is None:
+                return None
+            record = SessionRecord.from_bytes(blob)
+            if time.time() - record.touched_at > self.ttl_seconds:
+                self._drop(session_id)
+                return None
+            self._entries.move_to_end(session_id)
+            return record
+
+    def put(self, session_id: str, record: SessionRecord) -> None:
+        record.touched_at = time.time()
+        blob = record.to_bytes()
+        with self._lock:
+            if session_id in self._entries:
+                self._drop(session_id)
+            self._entries[session_id] = blob
+            self._bytes += self._cost(session_id, blob)
+            cutoff = record.touched_at - self.ttl_seconds
+            while self._entries and (
+                len(self._entries) > self.max_sessions
+                or self._bytes > self.max_bytes
+                # the oldest entry comes first; drop it early if it has expired anyway
+                or SessionRecord.from_bytes(next(iter(self._entries.values()))).touched_at < cutoff
+            ):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+class SqliteSessionBackend:
+    """Same records in a local SQLite file (WAL), shared by all workers on the host."""
+
+    def __init__(self, path: str, max_sessions: int = 100000, ttl_seconds: float = 1800.0):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._writes = 0
+        self._lock = threading.Lock()
+        # chat history is private: keep the file owner-only, as the report queue does
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        os.chmod(path, 0o600)
+        self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chat_sessions ("
+            "id TEXT PRIMARY KEY, record BLOB NOT NULL, touched_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS chat_sessions_touched ON chat_sessions (touched_at)")
+        self._db.commit()
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT record FROM chat_sessions WHERE id = ? AND touched_at >= ?",
+                (session_id, time.time() - self.ttl_seconds),
+            ).fetchone()
+        return SessionRecord.from_bytes(row[0]) if row else None
+
+    def put(self, session_id: str, record: SessionRecord) -> None:
+        record.touched_at = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO chat_sessions (id, record, touched_at) VALUES (?, ?, ?)",
+                (session_id, record.to_bytes(), record.touched_at),
+            )
+            self._writes += 1
+            # trim now and then rather than on every write
+            if self._writes % 100 == 0:
+                self._db.execute(
+                    "DELETE FROM chat_sessions WHERE touched_at < ?",
+                    (record.touched_at - self.ttl_seconds,),
+                )
+                self._db.execute(
+                    "DELETE FROM chat_sessions WHERE id IN ("
+                    "SELECT id FROM chat_sessions ORDER BY touched_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_sessions,),
+                )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()
+        return {"backend": "sqlite", "sessions": count}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
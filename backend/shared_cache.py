@@ -0,0 +1,125 @@
+"""
+Byte-budgeted key/value cache in a local SQLite file, shared by every worker
+process on the host.
+
+The file runs in WAL mode, so readers never block the single writer. The
+total stored size is kept in a one-row table that triggers update in the same
+transaction as each insert, update or delete. Every process therefore sees
+the same budget without scanning the table. When a put goes over budget,
+expired entries are dropped first, then the least recently used ones.
+Last-use times are refreshed at most once per `touch_interval`, so a hit is
+normally a single read.
+"""
+
+from typing import Optional, Tuple
+import sqlite3
+import threading
+import time
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS shared_cache ("
+    "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+    "created_at REAL NOT NULL, used_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS shared_cache_used ON shared_cache (used_at)",
+    "CREATE TABLE IF NOT EXISTS shared_cache_usage (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO shared_cache_usage (id, bytes) VALUES (0, 0)",
+    "CREATE TRIGGER IF NOT EXISTS shared_cache_ins AFTER INSERT ON shared_cache BEGIN "
+    "UPDATE shared_cache_usage SET bytes = bytes + new.size WHERE id = 0; END",
+    "CREATE TRIGGER IF NOT EXISTS shared_cache_upd AFTER UPDATE OF size ON shared_cache BEGIN "
+    "UPDATE shared_cache_usage SET bytes = bytes + new.size - old.size WHERE id = 0; END",
+    "CREATE TRIGGER IF NOT EXISTS shared_cache_del AFTER DELETE ON shared_cache BEGIN "
+    "UPDATE shared_cache_usage SET bytes = bytes - old.size WHERE id = 0; END",
+)
+# entries dropped per eviction step
+EVICT_BATCH = 16
+
+
+class SharedCache:
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 3600.0,
+        touch_interval: float = 60.0,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("BEGIN IMMEDIATE")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._db.execute("COMMIT")
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """The value and the time it was stored, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created_at, used_at FROM shared_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            if now - row[2] > self.touch_interval:
+                self._db.execute("UPDATE shared_cache SET used_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return bytes(row[0]), row[1]
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT INTO shared_cache (key, value, size, created_at, used_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                    "created_at = excluded.created_at, used_at = excluded.used_at",
+                    (key, value, len(value), now, now),
+                )
+                if self._usage() > self.max_bytes:
+                    self._evict(now)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _usage(self) -> int:
+        return self._db.execute("SELECT bytes FROM shared_cache_usage WHERE id = 0").fetchone()[0]
+
+    def _evict(self, now: float) -> None:
+        cursor = self._db.execute("DELETE FROM shared_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        self.evictions += cursor.rowcount
+        while self._usage() > self.max_bytes:
+            cursor = self._db.execute(
+                "DELETE FROM shared_cache WHERE key IN ("
+                "SELECT key FROM shared_cache ORDER BY used_at LIMIT ?)",
+                (EVICT_BATCH,),
+            )
+            if not cursor.rowcount:
+                break
+            self.evictions += cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._db.execute("SELECT COUNT(*) FROM shared_cache").fetchone()
+            return {
+                "entries": entries,
+                "bytes": self._usage(),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
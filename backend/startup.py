@@ -0,0 +1,137 @@
+"""
+Cold-start bookkeeping: import timings, lazy loading of heavy optional
+modules, an optional background warm-up and time to first response.
+
+main.py imports this module first so its clock starts before FastAPI and
+pydantic are loaded.
+"""
+
+from contextlib import contextmanager
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+IMPORT_STARTED = time.perf_counter()
+IMPORT_TIMES = {}
+
+_warmup_thread = None
+_warmup_done = threading.Event()
+_app_started = None
+_first_response = None
+
+
+def _process_age() -> float:
+    """Seconds since this process was created (Linux only), else 0."""
+    try:
+        with open("/proc/self/stat") as fh:
+            started_ticks = int(fh.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as fh:
+            uptime = float(fh.read().split()[0])
+        return max(0.0, uptime - started_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+# process age when this module was imported; the interpreter and server boot happened before it
+PROCESS_AGE_AT_IMPORT = _process_age()
+
+
+@contextmanager
+def import_timer(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        IMPORT_TIMES.setdefault(name, time.perf_counter() - start)
+
+
+def lazy_import(module: str):
+    """Import on first use and record how long it took."""
+    # always go through importlib: a module can already be in sys.modules
+    # while another thread is still executing it
+    loaded = module in sys.modules
+    start = time.perf_counter()
+    mod = importlib.import_module(module)
+    if not loaded:
+        IMPORT_TIMES.setdefault(module, time.perf_counter() - start)
+    return mod
+
+
+def start_warmup(modules) -> None:
+    """Import `modules` on a daemon thread right after startup."""
+    global _warmup_thread
+
+    def run():
+        start = time.perf_counter()
+        try:
+            for module in modules:
+                lazy_import(module)
+        except Exception:
+            logger.exception("warm-up failed; modules will load on first use instead")
+        finally:
+            IMPORT_TIMES.setdefault("warmup_total", time.perf_counter() - start)
+            _warmup_done.set()
+
+    _warmup_thread = threading.Thread(target=run, name="warmup", daemon=True)
+    _warmup_thread.start()
+
+
+def wait_for_warmup(timeout: float = 30.0) -> None:
+    """Block until the warm-up imports are done (returns at once without a warm-up)."""
+    if _warmup_thread is not None:
+        _warmup_done.wait(timeout)
+
+
+def mark_app_started() -> None:
+    global _app_started
+    if _app_started is None:
+        _app_started = time.perf_counter()
+
+
+def is_ready() -> bool:
+    # without a warm-up there is nothing to wait for once the app has started
+    return _app_started is not None and (_warmup_thread is None or _warmup_done.is_set())
+
+
+def report() -> dict:
+    def since_import(t):
+        return round(PROCESS_AGE_AT_IMPORT + t - IMPORT_STARTED, 4) if t is not None else None
+
+    return {
+        "ready": is_ready(),
+        "warmup": "off" if _warmup_thread is None else ("done" if _warmup_done.is_set() else "running"),
+        "seconds_before_app_import": round(PROCESS_AGE_AT_IMPORT, 4),
+        "seconds_to_app_started": since_import(_app_started),
+        "seconds_to_first_response": since_import(_first_response),
+        "import_seconds": {name: round(t, 4) for name, t in IMPORT_TIMES.items()},
+    }
+
+
+class FirstResponseMiddleware:
+    """Notes when the first HTTP response finishes, then gets out of the way."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if _first_response is not None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            global _first_response
+            await send(message)
+            if (
+                _first_response is None
+                and message["type"] == "http.response.body"
+                and not message.get("more_body", False)
+            ):
+                _first_response = time.perf_counter()
+                logger.info("startup report: %s", report())
+
+        await self.app(scope, receive, send_wrapper)
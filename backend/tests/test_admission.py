@@ -0,0 +1,124 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import AdmissionController, AdmissionRejected  # noqa: E402
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_round_robin_across_clients():
+    async def scenario():
+        ctl = AdmissionController(max_concurrent=1)
+        await ctl.acquire("holder", 1)
+        order = []
+
+        async def request(client, n):
+            await ctl.acquire(client, 1)
+            order.append(f"{client}{n}")
+
+        tasks = [asyncio.create_task(request("a", n)) for n in range(3)]
+        tasks += [asyncio.create_task(request("b", n)) for n in range(2)]
+        await settle()
+        assert ctl.queued == 5
+        for _ in range(6):
+            ctl.release(1, None)
+            await settle()
+        await asyncio.gather(*tasks)
+        return ctl, order
+
+    ctl, order = asyncio.run(scenario())
+    assert order == ["a0", "b0", "a1", "b1", "a2"]
+    assert ctl.stats()["active"] == 0
+    assert ctl.stats()["clients_waiting"] == 0
+
+
+def test_per_client_queue_limit():
+    async def scenario():
+        ctl = AdmissionController(max_concurrent=1, max_queued_per_client=1)
+        await ctl.acquire("holder", 1)
+        waiter = asyncio.create_task(ctl.acquire("a", 1))
+        await settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await ctl.acquire("a", 1)
+        waiter.cancel()
+        await settle()
+        return ctl, rejected.value
+
+    ctl, rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert rejected.reason == "client_queue_full"
+    assert ctl.queued == 0
+
+
+def test_timeout_leaves_no_waiter_behind():
+    async def scenario():
+        ctl = AdmissionController(max_concurrent=1, queue_timeout=0.01)
+        await ctl.acquire("holder", 1)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await ctl.acquire("a", 1)
+        ctl.release(1, None)
+        return ctl, rejected.value
+
+    ctl, rejected = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert rejected.reason == "queue_timeout"
+    assert ctl.stats()["active"] == 0
+    assert ctl.stats()["queued"] == 0
+    assert ctl.stats()["clients_waiting"] == 0
+
+
+def test_cancelled_waiter_is_skipped():
+    async def scenario():
+        ctl = AdmissionController(max_concurrent=1)
+        await ctl.acquire("holder", 1)
+        gone = asyncio.create_task(ctl.acquire("a", 1))
+        kept = asyncio.create_task(ctl.acquire("b", 1))
+        await settle()
+        # the waiter's future is cancelled, but its task has not run yet
+        # when the slot frees up
+        ctl._queues["a"][0][0].cancel()
+        gone.cancel()
+        ctl.release(1, None)
+        await settle()
+        assert kept.done()
+        with pytest.raises(asyncio.CancelledError):
+            await gone
+        return ctl
+
+    ctl = asyncio.run(scenario())
+    assert ctl.stats()["active"] == 1
+    assert ctl.stats()["queued"] == 0
+    assert ctl.stats()["clients_waiting"] == 0
+    ctl.release(1, None)
+    assert ctl.stats()["active"] == 0
+
+
+def test_cancelled_client_with_granted_slot_releases_it():
+    async def scenario():
+        ctl = AdmissionController(max_concurrent=1)
+        await ctl.acquire("holder", 1)
+
+        async def request():
+            async with ctl.admit("a", 1):
+                await asyncio.sleep(0.01)
+
+        waiter = asyncio.create_task(request())
+        await settle()
+        ctl.release(1, None)
+        waiter.cancel()
+        # before 3.12, wait_for returns the result instead when the future
+        # completed first; either way the slot is handed back
+        await asyncio.gather(waiter, return_exceptions=True)
+        return ctl
+
+    ctl = asyncio.run(scenario())
+    assert ctl.stats()["active"] == 0
+    assert ctl.stats()["queued"] == 0
@@ -0,0 +1,109 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_pipeline import LAB_RULES, analyze_report_text, scan_lab_values  # noqa: E402
+
+
+def values(text):
+    return [(r["analyte"], r["value"]) for r in scan_lab_values(text)]
+
+
+def test_every_alias_reads_its_analyte_in_its_first_unit():
+    for rule in LAB_RULES:
+        for alias in rule["aliases"]:
+            text = f"{alias.upper()}: 12.5 {rule['units'][0]}"
+            assert values(text) == [(rule["analyte"], 12.5)], text
+
+
+def test_longest_alias_wins_at_a_position():
+    # "ldl cholesterol" is one LDL marker, not LDL followed by total cholesterol
+    assert values("LDL Cholesterol 160 mg/dL") == [("ldl", 160)]
+    assert values("Fasting Blood Sugar 105 mg/dL") == [("glucose", 105)]
+
+
+def test_tsh_units():
+    for unit in ("mIU/L", "uIU/mL", "µIU/mL", "μIU/mL", "mU/L"):
+        assert values(f"TSH 5.2 {unit}") == [("tsh", 5.2)], unit
+
+
+def test_value_needs_a_unit_of_the_marker():
+    assert values("LDL 3.1 mmol/L") == []
+    # a value in another unit is skipped, the next one in mg/dL is taken
+    assert values("LDL 3.1 mmol/L (120 mg/dL)") == [("ldl", 120)]
+    assert values("HbA1c 48 mg/dL 6.1 %") == [("hba1c", 6.1)]
+
+
+def test_decimal_values():
+    assert scan_lab_values("HbA1c 6.0 %")[0]["value"] == 6
+    assert isinstance(scan_lab_values("HbA1c 6.0 %")[0]["value"], int)
+    assert values("TSH 0.35 mIU/L") == [("tsh", 0.35)]
+    # a number is only read from the start of its digit run
+    assert values("Glucose 1.5 mg/dL") == [("glucose", 1.5)]
+    assert values("Glucose .5 mg/dL") == []
+
+
+def test_marker_takes_first_value_on_its_line_only():
+    assert values("Glucose 92 mg/dL, repeat 130 mg/dL") == [("glucose", 92)]
+    assert values("HDL\n52 mg/dL") == []
+    assert values("LDL 120 mg/dL\nHDL 52 mg/dL") == [("ldl", 120), ("hdl", 52)]
+    # markers still waiting on a line share the value that ends it
+    assert values("LDL and HDL 45 mg/dL") == [("ldl", 45), ("hdl", 45)]
+
+
+def test_offsets_point_at_the_marker():
+    text = "Report\nTriglycerides: 180 mg/dL"
+    (reading,) = scan_lab_values(text)
+    assert reading["offset"] == text.lower().index("triglycerides")
+    assert reading["unit"] == "mg/dl"
+
+
+def test_blood_pressure_pairs():
+    assert scan_lab_values("BP: 150 / 95 mmHg") == [{
+        "analyte": "blood_pressure", "value": 150, "diastolic": 95, "unit": "mmhg", "offset": 4,
+    }]
+    assert values("BP 118/76mmHg and 142/91 mmHg") == [("blood_pressure", 118), ("blood_pressure", 142)]
+    # both numbers are two or three digits, starting a digit run, on one line
+    assert values("1120/80 mmHg") == []
+    assert values("12.5/80 mmHg") == []
+    assert values("120/\n80 mmHg") == []
+
+
+def test_markers_start_on_a_word_boundary():
+    assert values("VLDL 30 mg/dL") == []
+    assert values("xHDL 30 mg/dL") == []
+    assert values("2TSH 5 mIU/L") == []
+    assert values("(HDL) 52 mg/dL") == [("hdl", 52)]
+
+
+def test_non_hdl_and_vldl_are_not_read_as_other_markers():
+    assert values("Non-HDL Cholesterol 160 mg/dL") == []
+    assert values("non hdl 150 mg/dL") == []
+    assert values("VLDL Cholesterol 30 mg/dL") == []
+    # the real HDL further down is not masked by the non-HDL line
+    assert values("Non-HDL cholesterol 160 mg/dL\nHDL 35 mg/dL") == [("hdl", 35)]
+    assert values("Non-HDL-C 150 mg/dL, HDL-C 38 mg/dL") == [("hdl", 38)]
+
+
+def test_ldl_cholesterol_is_not_total_cholesterol():
+    # The regex analyzer matched r"cholesterol.*?(\d+)\s*mg/dl" inside
+    # "LDL Cholesterol" and reported the LDL value as total cholesterol.
+    findings = analyze_report_text("LDL Cholesterol: 250 mg/dL")
+    assert not any(f.startswith("Total cholesterol") for f in findings)
+    assert any(f.startswith("LDL") for f in findings)
+    assert values("LDL Cholesterol: 250 mg/dL\nTotal Cholesterol: 190 mg/dL") == [
+        ("ldl", 250), ("total_cholesterol", 190),
+    ]
+
+
+def test_findings_use_first_reading_and_thresholds():
+    findings = analyze_report_text(
+        "Blood pressure 142/88 mmHg\n"
+        "HDL 35 mg/dL\n"
+        "HDL 60 mg/dL\n"
+        "Triglycerides 150 mg/dL\n"
+    )
+    assert len(findings) == 2
+    assert findings[0].startswith("Blood pressure appears elevated around 142/88 mmHg")
+    assert "HDL" in findings[1] and "35 mg/dL" in findings[1]